@@ -0,0 +1,57 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,os.path.join(ROOT,'stocks'))
+
+from stocks_data import candle_directions
+
+# Candle direction (up when Close > Open) of synthetic daily bars: the row-wise
+# apply the page used, on the worksheet strings it used to compare and on
+# numbers, against the vectorized candle_directions. Checks candle_directions
+# against plain float comparisons, and counts how many bars the string
+# comparison got wrong.
+# Usage: python benchmarks/bench_candles.py [bars]
+
+# What the page did before
+def changes(row):
+    if row.Close > row.Open:
+        return True
+    else:
+        return False
+
+def bars(n,seed=0):
+    rng = np.random.default_rng(seed)
+    # prices either side of 10 so that '9.8' > '10.1' comes up, some flat days
+    open_ = np.round(rng.uniform(5,15,n),1)
+    close = np.where(rng.random(n) < 0.05,open_,np.round(open_ + rng.normal(0,0.5,n),1))
+    close[rng.random(n) < 0.001] = np.nan
+    return pd.DataFrame({'Open':open_,'Close':close})
+
+def timed(fn,*args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def main(n=1000000):
+    df = bars(n)
+    strings = df.astype(str)
+
+    expected = np.array([1 if c > o else 0 for o,c in zip(df['Open'].tolist(),df['Close'].tolist())],dtype=np.int8)
+    legacy, legacy_time = timed(lambda: df.apply(lambda x: changes(x),axis=1).values)
+    legacy_strings, _ = timed(lambda: strings.apply(lambda x: changes(x),axis=1).values)
+    vectorized, vectorized_time = timed(candle_directions,df)
+
+    assert vectorized.dtype == np.int8
+    assert (vectorized == expected).all()
+    assert (legacy.astype(np.int8) == expected).all()
+
+    print('%d bars, %d up, %d compared wrongly as strings' % (n,expected.sum(),(legacy_strings.astype(np.int8) != expected).sum()))
+    for name,elapsed in [('apply(changes)',legacy_time),('candle_directions',vectorized_time)]:
+        print('%-20s %10.2f ms %10.0fx' % (name,elapsed * 1000,legacy_time / elapsed))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
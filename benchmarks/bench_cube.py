@@ -0,0 +1,96 @@
+import os
+import sys
+import time
+import timeit
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,os.path.join(ROOT,'bokeh'))
+
+from jsharness import node_available, callback_setup, run_callback, time_callback
+from bench_suite import page_callbacks, drill_ticks
+from pop_density_data import UNSPLIT, build_final_df, build_demographics, load_base_maps, prepare_base_map, join_eras
+from pop_density_plot import population_model, population_map, drill_down, bin_labels, bin_palette, VALUE_COLUMNS, DRILL_JS
+from pop_cube import SEX_OPTIONS, age_options, age_weights, area_totals, demographic_cube
+
+# Drill-downs on the demographic cube against the pandas groupby they replace,
+# on the bundled datasets/population-density files: the time to build the cube,
+# and per age group and sex selection the (area, year) totals from the cube and
+# from a groupby of the long table, which must agree. Then the page's DRILL_JS
+# callback is run under node for every selection and must recolor the map with
+# the same totals, bins and color bar as drill_down.
+# Usage: python benchmarks/bench_cube.py
+
+# The (area, year) totals of a selection by filtering and grouping the long
+# table, NaN where counts not split by sex would be needed
+def groupby_totals(demographics,cube,age,sex):
+    ages = set(cube['age_groups'][age_weights(cube,age).astype(bool)])
+    rows = demographics[demographics['age_group'].astype(str).isin(ages)]
+    sexes, unknown = SEX_OPTIONS[sex]
+    wanted = [name for name,weight in zip(cube['sexes'],sexes) if weight]
+    keys = ['planning_area','year']
+    totals = rows[rows['sex'].astype(str).isin(wanted)].groupby(keys,observed=True)['resident_count'].sum()
+    totals = totals.unstack('year').reindex(index=cube['areas'],columns=cube['years']).astype(np.float64)
+    if any(unknown):
+        unsplit = rows[rows['sex'].astype(str) == UNSPLIT].groupby(keys,observed=True)['resident_count'].sum()
+        unsplit = unsplit.unstack('year').reindex(index=cube['areas'],columns=cube['years']).fillna(0)
+        totals[unsplit > 0] = np.nan
+    return totals.values
+
+def check_totals(demographics,cube,selections):
+    print('%-16s %-12s %14s %14s %8s' % ('age group','sex','cube (us)','groupby (us)','speedup'))
+    for age,sex in selections:
+        expected = groupby_totals(demographics,cube,age,sex)
+        totals = area_totals(cube,age,sex)
+        # areas with no rows for the selection are 0 in the cube, not missing
+        compared = ~np.isnan(expected)
+        assert np.array_equal(totals[compared],expected[compared]), (age,sex)
+        assert np.all(np.isnan(totals[~compared]) | (totals[~compared] == 0)), (age,sex)
+        cube_us = min(timeit.repeat(lambda: area_totals(cube,age,sex),number=20,repeat=3)) / 20 * 1e6
+        groupby_us = min(timeit.repeat(lambda: groupby_totals(demographics,cube,age,sex),number=3,repeat=3)) / 3 * 1e6
+        print('%-16s %-12s %14.1f %14.1f %7.0fx' % (age,sex,cube_us,groupby_us,groupby_us / cube_us))
+
+# DRILL_JS against drill_down for every selection
+def check_drill(callback,model,selections):
+    eras = sorted(model['values'])
+    output = "{values: Object.fromEntries(%s.map((era) => [era, value_sources[era].data])), palette: color_mapper.palette, labels: color_bar.major_label_overrides}" % list(eras)
+    setup_js, names = callback_setup(callback)
+    results = run_callback(callback.code,names,setup_js,'age_select.value = tick[0]; sex_select.value = tick[1]',selections,output)
+    for (age,sex),result in zip(selections,results):
+        drill_down(model,age,sex)
+        for era in eras:
+            for column in VALUE_COLUMNS:
+                shown = np.array(result['values'][era][column],dtype=np.float64)
+                np.testing.assert_array_equal(shown,model['values'][era][column].ravel(),err_msg='%s %s %s %s' % (age,sex,era,column))
+        assert result['palette'] == list(bin_palette(len(model['density_edges']) - 1))
+        assert result['labels'] == bin_labels(model['density_edges']), (result['labels'],bin_labels(model['density_edges']))
+    return setup_js, names
+
+def main():
+    demographics = build_demographics()
+    times = []
+    for i in range(3):
+        start = time.perf_counter()
+        cube = demographic_cube(demographics)
+        times.append(time.perf_counter() - start)
+    print('%d rows -> cube of %s counts (%d bytes) in %.1f ms' % (len(demographics),'x'.join(map(str,cube['counts'].shape)),cube['counts'].nbytes,min(times) * 1000))
+
+    selections = [(age,sex) for age in age_options(cube)[:4] + age_options(cube)[-2:] for sex in SEX_OPTIONS]
+    check_totals(demographics,cube,selections)
+
+    base_maps = {era:prepare_base_map(map_df) for era,map_df in load_base_maps().items()}
+    joined = join_eras(build_final_df(),base_maps)
+    start_year = int(joined['year'].max())
+    model = population_model(joined,base_maps,cube)
+    drill_us = min(timeit.repeat(lambda: drill_down(model,'65 and over','Females'),number=20,repeat=3)) / 20 * 1e6
+    print('drill_down in Python: %.1f us per selection' % drill_us)
+    if not node_available():
+        print('node is required to run the CustomJS callbacks headlessly')
+        return
+    callback = page_callbacks([population_map(joined,base_maps,start_year=start_year,cube=cube)])[DRILL_JS]
+    setup_js, names = check_drill(callback,model,selections + [selections[0]])
+    ticks = drill_ticks(callback.args['age_select'].options,callback.args['sex_select'].options)
+    print('DRILL_JS: %.1f us per selection' % time_callback(callback.code,names,setup_js,'age_select.value = tick[0]; sex_select.value = tick[1]',ticks))
+
+if __name__ == '__main__':
+    main()
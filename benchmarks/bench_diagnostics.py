@@ -0,0 +1,96 @@
+import os
+import sys
+import json
+import time
+import timeit
+import logging
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,os.path.join(ROOT,'stocks'))
+sys.path.insert(0,os.path.join(ROOT,'shared'))
+
+from fake_gspread import synthetic_spreadsheets
+from fake_streamlit import fake_streamlit
+from bench_documents import stocks_page
+from diagnostics import Diagnostics, diagnostics_setting, log
+
+# Cost of the stage instrumentation: a stage() block with diagnostics off, on
+# and tracing memory, and the whole stocks page run offline in each mode. Checks
+# that every mode renders the same charts and that a rerun with diagnostics on
+# logs one JSON line and shows its stages. Also checks that only the environment
+# variable turns memory tracing on, and that tracing runs while any Diagnostics
+# tracing memory is open, reported or not.
+# Usage: python benchmarks/bench_diagnostics.py [days]
+
+class Lines(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self,record):
+        self.lines.append(record.getMessage())
+
+def block_us(setting,n=100000):
+    diagnostics = Diagnostics('bench',setting)
+    def block():
+        with diagnostics.stage('stage') as stage:
+            stage.output(None,rows=1)
+    us = min(timeit.repeat(block,number=n,repeat=3)) / n * 1e6
+    diagnostics.report(fake_streamlit({}))
+    return us
+
+def check_setting():
+    for variable,query,expected in [('','1','1'),('','memory',''),('1','memory','1'),('memory','','memory'),('memory','1','memory')]:
+        os.environ['DASHBOARD_DIAGNOSTICS'] = variable
+        assert diagnostics_setting(fake_streamlit({},{'diagnostics':[query]} if query else None)) == expected, (variable,query)
+
+def check_tracing():
+    st = fake_streamlit({})
+    first, second = Diagnostics('first','memory'), Diagnostics('second','memory')
+    first.report(st)
+    first.report(st)
+    assert tracemalloc.is_tracing()
+    # a rerun that ended early lets go when it is dropped
+    del second
+    assert not tracemalloc.is_tracing()
+    Diagnostics('early','memory')
+    assert not tracemalloc.is_tracing()
+
+def main(days=1000):
+    sheets = synthetic_spreadsheets('hourly','daily',days=days)
+    lines = Lines()
+    log.handlers, saved = [lines], log.handlers
+    try:
+        check_setting()
+        check_tracing()
+        print('%-10s %16s %12s %12s' % ('setting','stage block (us)','page (ms)','log lines'))
+        for setting in ['','1','memory']:
+            os.environ['DASHBOARD_DIAGNOSTICS'] = setting
+            block = block_us(setting)
+            before = len(lines.lines)
+            times = []
+            for i in range(3):
+                start = time.perf_counter()
+                st = stocks_page(sheets)
+                times.append(time.perf_counter() - start)
+            assert len(st.charts) == 2
+            logged = lines.lines[before:]
+            if setting:
+                assert len(logged) == 3
+                summary = json.loads(logged[-1])
+                assert summary['page'] == 'stocks' and summary['stages']
+                assert all(stage['ms'] >= 0 for stage in summary['stages'])
+                assert (summary['stages'][0]['peak_bytes'] is None) == (setting != 'memory')
+                assert st.frames[-1]['stage'].tolist() == [stage['stage'] for stage in summary['stages']]
+            else:
+                assert not logged
+            print('%-10s %16.3f %12.1f %12d' % (setting or 'off',block,min(times) * 1000,len(logged)))
+        for stage in summary['stages']:
+            print('    %-28s %10.1f ms %10s rows %12d B in %12d B out %12d B peak' % (stage['stage'],stage['ms'],stage['rows'],stage['bytes_in'],stage['bytes_out'],stage['peak_bytes']))
+    finally:
+        log.handlers = saved
+        os.environ.pop('DASHBOARD_DIAGNOSTICS',None)
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,78 @@
+import os
+import sys
+import json
+import time
+import types
+import tempfile
+from bokeh.embed import json_item
+from bokeh.models import ColumnDataSource
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,os.path.join(ROOT,'bokeh'))
+sys.path.insert(0,os.path.join(ROOT,'stocks'))
+
+from fake_gspread import FakeClient, synthetic_spreadsheets
+from fake_streamlit import fake_streamlit, run_page
+from bench_payload import ERA_YEARS, synthetic_joined
+from pop_density_data import load_base_maps, prepare_base_map
+from pop_density_plot import population_map
+import hourly_store
+
+# Serialized size and serialization time of every Bokeh document on the two
+# pages: the population map on the real boundaries with synthetic totals, and
+# the stocks page run offline on `days` of synthetic sheets. Lists the data
+# columns that Bokeh still encodes element by element as JSON instead of as
+# binary arrays.
+# Usage: python benchmarks/bench_documents.py [days]
+
+def population_documents():
+    base_maps = {era:prepare_base_map(map_df) for era,map_df in load_base_maps().items()}
+    return {'population map':population_map(synthetic_joined(base_maps,ERA_YEARS),base_maps)}
+
+# Runs the stocks page offline on `sheets` (see synthetic_spreadsheets) with the
+# hourly store in a temporary directory; returns the fake streamlit module, which
+# holds what the page drew
+def stocks_page(sheets):
+    gspread = types.ModuleType('gspread')
+    gspread.service_account_from_dict = lambda credentials,scopes=None: FakeClient(sheets,0)
+    st = fake_streamlit({'gcp_service_account':{},'stocks_hourly_record_url':'hourly','daily_data':'daily'})
+    with tempfile.TemporaryDirectory() as cache:
+        saved, hourly_store.STORE_PATH = hourly_store.STORE_PATH, os.path.join(cache,'hourly.sqlite')
+        try:
+            run_page(os.path.join(ROOT,'stocks','streamlit_stocks.py'),{'gspread':gspread,'streamlit':st})
+        finally:
+            hourly_store.STORE_PATH = saved
+    return st
+
+def stocks_documents(days):
+    st = stocks_page(synthetic_spreadsheets('hourly','daily',days=days))
+    return dict(zip(['stocks: STI','stocks: technical analysis'],st.charts))
+
+def serialize(layout,repeat=3):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        document = json.dumps(json_item(layout))
+        times.append(time.perf_counter() - start)
+    return len(document), min(times)
+
+# {source name: [(column, bytes)]} of the columns not sent as binary arrays
+def json_columns(layout):
+    columns = {}
+    for source in layout.select({'type':ColumnDataSource}):
+        for column,value in source.to_json(True)['data'].items():
+            if not (isinstance(value,dict) and '__ndarray__' in value):
+                columns.setdefault(source.id,[]).append((column,len(json.dumps(value))))
+    return columns
+
+def main(days=1000):
+    documents = {**population_documents(),**stocks_documents(days)}
+    print('%-28s %12s %10s' % ('document','bytes','ms'))
+    for name,layout in documents.items():
+        size, elapsed = serialize(layout)
+        print('%-28s %12d %10.1f' % (name,size,elapsed * 1000))
+        for source,columns in json_columns(layout).items():
+            print('%28s %s' % ('JSON columns:',', '.join('%s (%d bytes)' % column for column in columns)))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
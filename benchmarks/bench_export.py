@@ -0,0 +1,122 @@
+import os
+import sys
+import json
+import time
+import tempfile
+from bokeh.embed import file_html
+from bokeh.resources import CDN
+from bokeh.models import Slider
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,os.path.join(ROOT,'bokeh'))
+
+from jsharness import node_available, callback_setup, run_async_callback
+from bench_suite import page_callbacks
+from pop_density_data import build_final_df, build_demographics, load_base_maps, prepare_base_map, join_eras
+from pop_density_plot import population_model, population_map, drill_down, year_values, year_data, year_span, SLIDER_JS, ZOOM_JS, DRILL_JS
+from pop_cube import demographic_cube
+from pop_geometry import SIMPLIFY_TOLERANCES
+from pop_export import TITLE, export_site
+
+# The static export against the page with every era embedded, on the bundled
+# datasets/population-density files: the export time and the bytes of the
+# exported index.html and data files next to the single all-in-one HTML file.
+# Then the exported page's callbacks are run under node with fetch reading the
+# data files from disk, gzipped and, as a server sending them with
+# Content-Encoding: gzip would, already inflated. Every year must show the same
+# totals as the model, each file must be fetched once, and a drill-down must
+# load the other eras and give drill_down's values. Only a zoom to another tier
+# of the start era fetches that era's file, and shows the tier's boundaries.
+# Left to its defaults, the export opens on the latest year and is titled with
+# the years of the data.
+# Usage: python benchmarks/bench_export.py
+
+FETCH_JS = """
+const fs = require('fs'), path = require('path'), zlib = require('zlib');
+const fetched = [];
+globalThis.fetch = async (url) => {
+  fetched.push(url);
+  const bytes = fs.readFileSync(path.join(%s, url));
+  return new Response(%s ? zlib.gunzipSync(bytes) : bytes);
+};
+const settled = () => Promise.all(Object.values(lod.pending || {}));
+"""
+
+def check_slider(layout,model,out_dir,inflated):
+    callback = page_callbacks([layout])[SLIDER_JS]
+    setup_js, names = callback_setup(callback)
+    start_year = callback.args['slider'].value
+    # every year twice, starting from the embedded era
+    years = sorted(model['year_era'],key=lambda year: (model['year_era'][year] != model['year_era'][start_year],year)) * 2
+    output = "{total: source2.data['total'], fetched: fetched.length}"
+    results = run_async_callback(callback.code,names,setup_js + FETCH_JS % (json.dumps(out_dir),json.dumps(inflated)),'slider.value = tick',years,output)
+    for year,result in zip(years,results):
+        assert result['total'] == [None if total != total else total for total in year_values(model,year).tolist()], year
+    # all but the start era's other tiers
+    assert results[-1]['fetched'] == len(callback.args['era_files']) - 1
+
+def check_drill(layout,model,out_dir,age='65 and over',sex='Females'):
+    callback = page_callbacks([layout])[DRILL_JS]
+    setup_js, names = callback_setup(callback)
+    output = "{values: Object.fromEntries(Object.entries(value_sources).map(([era, source]) => [era, source.data['total']])), fetched: fetched.length}"
+    result, = run_async_callback(callback.code,names,setup_js + FETCH_JS % (json.dumps(out_dir),'false'),'age_select.value = tick[0]; sex_select.value = tick[1]',[[age,sex]],output)
+    drill_down(model,age,sex)
+    for era,totals in result['values'].items():
+        assert totals == [None if total != total else total for total in model['values'][era]['total'].ravel().tolist()], era
+    assert result['fetched'] == len(callback.args['era_files']) - 1
+
+def nested_lists(rings):
+    return [[[ring.tolist() for ring in polygon] for polygon in area] for area in rings]
+
+# Zooms the start year through every tier, finest first, and back out; the
+# first zoom fetches the start era's other tiers
+def check_zoom(layout,model,out_dir,start_year):
+    callback = page_callbacks([layout])[ZOOM_JS]
+    setup_js, names = callback_setup(callback)
+    width = 700
+    start = callback.args['lod'].data['tier'][0]
+    tiers = list(range(len(SIMPLIFY_TOLERANCES))) + [start]
+    assert start != 0
+    # a pixel just over each tier's tolerance
+    ticks = [[SIMPLIFY_TOLERANCES[tier] * width * 1.01,width] for tier in tiers]
+    output = "{tier: lod.data['tier'][0], xs: source2.data['xs'], fetched: fetched.length}"
+    results = run_async_callback(callback.code,names,setup_js + FETCH_JS % (json.dumps(out_dir),'false'),
+                                 'x_range.start = 0; x_range.end = tick[0]; plot.inner_width = tick[1]',ticks,output)
+    for tier,result in zip(tiers,results):
+        assert result['tier'] == tier
+        assert result['xs'] == nested_lists(year_data(model,start_year,tier)['xs']), tier
+        assert result['fetched'] == 1
+
+def main():
+    base_maps = {era:prepare_base_map(map_df) for era,map_df in load_base_maps().items()}
+    joined = join_eras(build_final_df(),base_maps)
+    cube = demographic_cube(build_demographics())
+    start_year = int(joined['year'].max())
+    title = TITLE % year_span(joined['year'].unique())
+    inline = file_html(population_map(joined,base_maps,cube=cube),CDN,title)
+    with tempfile.TemporaryDirectory() as out_dir:
+        start = time.perf_counter()
+        layout, era_files = export_site(joined,base_maps,cube,out_dir)
+        elapsed = time.perf_counter() - start
+        assert layout.select_one({'type':Slider}).value == start_year
+        with open(os.path.join(out_dir,'index.html'),encoding='utf-8') as f:
+            assert '<title>%s</title>' % title in f.read()
+        print('%-36s %12s' % ('file','bytes'))
+        print('%-36s %12d' % ('all eras in one HTML file',len(inline.encode())))
+        for path in ['index.html'] + list(era_files.values()):
+            print('%-36s %12d' % (path,os.path.getsize(os.path.join(out_dir,path))))
+        print('exported in %.1f ms' % (elapsed * 1000))
+        # an unchanged build writes the same files
+        assert export_site(joined,base_maps,cube,out_dir,start_year)[1] == era_files
+        if not node_available():
+            print('node is required to run the CustomJS callbacks headlessly')
+            return
+        model = population_model(joined,base_maps,cube)
+        check_slider(layout,model,out_dir,inflated=False)
+        check_slider(layout,model,out_dir,inflated=True)
+        check_drill(layout,model,out_dir)
+        check_zoom(layout,model,out_dir,start_year)
+        print('exported page matches the model')
+
+if __name__ == '__main__':
+    main()
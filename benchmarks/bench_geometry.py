@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+import numpy as np
+import shapely
+import geopandas as gpd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,os.path.join(ROOT,'bokeh'))
+
+from pop_density_data import load_base_maps
+from pop_geometry import multipolygon_coords
+
+# Benchmark of boundary -> multi_polygons coordinate extraction. Checks that
+# the vectorized extraction gives the legacy loop's rings, row by row and in
+# order, on every base map and the synthetic map, and that it nests holes and
+# MultiPolygon parts as multi_polygons expects, where the loop drew each hole
+# as a polygon of its own.
+# Usage: python benchmarks/bench_geometry.py [n_synthetic_polygons]
+
+# The per-vertex loop previously inlined three times in streamlit_pop_density.py
+# (updated for shapely 2, where multi-part geometries are iterated via .geoms)
+def legacy_coords(map_df):
+    xs = []
+    ys = []
+    for obj in map_df.geometry.boundary:
+        if obj.geom_type == 'LineString':
+            obj_x, obj_y = obj.xy
+            xs.append([[list(obj_x)]])
+            ys.append([[list(obj_y)]])
+        elif obj.geom_type == 'MultiLineString':
+            obj_x = []
+            obj_y = []
+            for line in obj.geoms:
+                line_x, line_y = line.xy
+                obj_x.append([list(line_x)])
+                obj_y.append([list(line_y)])
+            xs.append(obj_x)
+            ys.append(obj_y)
+    return xs, ys
+
+# n circles with 33 vertices each; every 7th gets a hole and every 5th is
+# paired with a neighbour into a MultiPolygon
+def synthetic_map(n,seed=0):
+    rng = np.random.default_rng(seed)
+    centres = shapely.points(rng.uniform(0,1000,size=(n,2)))
+    polys = shapely.buffer(centres,2.0,quad_segs=8)
+    holed = np.arange(0,n,7)
+    polys[holed] = shapely.difference(polys[holed],shapely.buffer(centres[holed],0.5,quad_segs=4))
+    multi = np.arange(0,n - 1,5)
+    polys[multi] = [shapely.MultiPolygon([a,b]) for a,b in zip(polys[multi],polys[multi + 1])]
+    return gpd.GeoDataFrame(geometry=polys)
+
+# Every ring of each row as (xs, ys) lists, whatever polygon it belongs to
+def row_rings(xs,ys):
+    return [[(list(x),list(y)) for xp,yp in zip(row_x,row_y) for x,y in zip(xp,yp)] for row_x,row_y in zip(xs,ys)]
+
+def check_legacy(name,map_df):
+    assert row_rings(*multipolygon_coords(map_df)) == row_rings(*legacy_coords(map_df)), name
+
+def check_nesting():
+    def square(x0,size):
+        return [(x0,0.0),(x0 + size,0.0),(x0 + size,size),(x0,size),(x0,0.0)]
+    # each ring of a polygon, exterior first, as [xs, ys]
+    def rings(polygon):
+        return [[list(x) for x in zip(*ring.coords)] for ring in [polygon.exterior] + list(polygon.interiors)]
+    holed = shapely.Polygon(square(0.0,4.0),[square(1.0,1.0)])
+    multi = shapely.MultiPolygon([shapely.Polygon(square(10.0,1.0)),shapely.Polygon(square(20.0,1.0))])
+    xs, ys = multipolygon_coords(gpd.GeoDataFrame(geometry=[holed,multi]))
+    nested = [[[[list(x),list(y)] for x,y in zip(xp,yp)] for xp,yp in zip(row_x,row_y)] for row_x,row_y in zip(xs,ys)]
+    assert nested == [[rings(holed)],[rings(part) for part in multi.geoms]]
+    # the legacy loop split the hole off into a polygon of its own
+    assert len(legacy_coords(gpd.GeoDataFrame(geometry=[holed]))[0][0]) == 2
+
+def best_of(fn,arg,repeat=5):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def vertex_count(xs):
+    return sum(len(ring) for polys in xs for rings in polys for ring in rings)
+
+def main(n_synthetic=10000):
+    maps = {'map_' + era:map_df for era,map_df in load_base_maps().items()}
+    maps['synthetic_' + str(n_synthetic)] = synthetic_map(n_synthetic)
+
+    print('%-18s %8s %10s %12s %12s %8s' % ('map','rows','vertices','legacy (ms)','vector (ms)','speedup'))
+    check_nesting()
+    for name,map_df in maps.items():
+        check_legacy(name,map_df)
+        xs, ys = multipolygon_coords(map_df)
+        legacy = best_of(legacy_coords,map_df,repeat=3)
+        vector = best_of(multipolygon_coords,map_df)
+        print('%-18s %8d %10d %12.2f %12.2f %7.1fx' % (name,len(map_df),vertex_count(xs),legacy * 1000,vector * 1000,legacy / vector))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
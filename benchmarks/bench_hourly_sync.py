@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,os.path.join(ROOT,'stocks'))
+
+from fake_gspread import FakeClient, hourly_frame, synthetic_spreadsheets, _records
+from stock_sources import SheetLoader, records_frame
+from hourly_store import HourlyStore
+
+# Cost of refreshing the hourly price history through the local HourlyStore
+# against re-downloading both worksheets, offline on synthetic sheets. Checks
+# after every step that the store holds exactly pd.concat([past data, Record]).
+# Usage: python benchmarks/bench_hourly_sync.py [days of history]
+
+def legacy_frame(sheets):
+    return pd.concat([records_frame(sheets['past data']),records_frame(sheets['Record'])],ignore_index=True)
+
+def measure(client,fn):
+    client.requests = client.cells = 0
+    start = time.perf_counter()
+    fn()
+    return client.requests, client.cells, time.perf_counter() - start
+
+def sheet_times(frame):
+    return pd.to_datetime(frame['Date'] + ' ' + frame['Time'],format='%Y-%m-%d %H:%M')
+
+# The next `hours` trading hours of prices for every symbol, as sheet rows;
+# drawn from a few days past the history, enough for every step below
+def new_hours(sheets,days,hours,seed=1):
+    later = hourly_frame(days + hours // 9 + 5,seed=seed)
+    last = records_frame(sheets['Record'])
+    after = sheet_times(later) > sheet_times(last).max()
+    stamps = (later['Date'] + ' ' + later['Time'])[after].unique()[:hours]
+    return _records(later[(later['Date'] + ' ' + later['Time']).isin(stamps)])[1:]
+
+# The same rows with the hour written without a leading zero ('9:00')
+def unpadded(rows):
+    return [[date,time_.lstrip('0'),*rest] for date,time_,*rest in rows]
+
+def main(days=1000):
+    spreadsheets = synthetic_spreadsheets(days=days)
+    sheets = spreadsheets['hourly']
+    client = FakeClient(spreadsheets,latency=0)
+    directory = tempfile.mkdtemp()
+    try:
+        store = HourlyStore(SheetLoader(client),'hourly',path=os.path.join(directory,'hourly.sqlite'))
+        print('%-34s %9s %10s %9s %10s' % ('step','requests','cells','seconds','rows'))
+
+        def report(step,fn):
+            requests, cells, elapsed = measure(client,fn)
+            frame = store.frame()
+            pd.testing.assert_frame_equal(frame,legacy_frame(sheets))
+            print('%-34s %9d %10d %9.3f %10d' % (step,requests,cells,elapsed,len(frame)))
+            return cells
+
+        requests, cells, elapsed = measure(client,lambda: legacy_frame({name:client.open_by_url('hourly').worksheet(name).get_all_values() for name in ['past data','Record']}))
+        print('%-34s %9d %10d %9.3f %10s' % ('re-download both worksheets',requests,cells,elapsed,''))
+        full = report('first sync (empty store)',store.sync)
+        report('sync, nothing new',store.sync)
+        sheets['Record'] += new_hours(sheets,days,1)
+        incremental = report('sync, 1 new hour',store.sync)
+        sheets['Record'] += new_hours(sheets,days,9)
+        report('sync, 9 new hours',store.sync)
+
+        # hours written as '9:00': one at a time, so a sync after the 9:00 row
+        # must still take '10:00' as later
+        for hour in range(10):
+            sheets['Record'] += unpadded(new_hours(sheets,days,1))
+            report('sync, 1 new unpadded hour',store.sync)
+
+        # 'Record' rolled over into 'past data', then a new hour arrives
+        sheets['past data'] += sheets['Record'][1:]
+        sheets['Record'] = sheets['Record'][:1] + new_hours(sheets,days,1)
+        report('sync after Record rolled over',store.sync)
+
+        assert incremental * 20 < full, 'an incremental sync downloads the whole history'
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
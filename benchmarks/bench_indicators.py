@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,os.path.join(ROOT,'stocks'))
+
+from indicators import DEFAULT_INDICATORS, compute_indicators, indicator_columns
+
+# Daily indicators for many stocks over several years of synthetic closes: the
+# grouped pass over every stock, the same formulas applied stock by stock with
+# pandas, and the resumed pass absorbing one new bar per stock. Checks that all
+# three agree.
+# Usage: python benchmarks/bench_indicators.py [years] [symbols]
+
+def closes(years,n_symbols,seed=0):
+    days = 252 * years
+    rng = np.random.default_rng(seed)
+    close = np.abs(10 + np.cumsum(rng.normal(0,0.1,(n_symbols,days)),axis=1))
+    return pd.DataFrame({
+        'Symbol':np.repeat(['S%04d' % i for i in range(n_symbols)],days),
+        'datetime':np.tile(pd.bdate_range('2015-01-01',periods=days).values,n_symbols),
+        'Close':close.ravel(),
+    })
+
+# The formulas one stock at a time
+def per_symbol(df,config=DEFAULT_INDICATORS):
+    frames = []
+    for symbol,rows in df.groupby('Symbol',sort=False):
+        close = rows['Close']
+        out = {}
+        for span in config['ema']:
+            out['ema%d' % span] = close.ewm(span=span,adjust=False).mean()
+        for window in config['sma']:
+            out['sma%d' % window] = close.rolling(window).mean()
+        window, k = config['bollinger']
+        mean, std = close.rolling(window).mean(), close.rolling(window).std(ddof=0)
+        out['bb_upper'], out['bb_lower'] = mean + k * std, mean - k * std
+        period = config['rsi']
+        delta = close.diff()
+        gain = delta.clip(lower=0).ewm(alpha=1 / period,adjust=False).mean()
+        loss = (-delta).clip(lower=0).ewm(alpha=1 / period,adjust=False).mean()
+        rsi = (100 - 100 / (1 + gain / loss)).where(loss != 0,100.0)
+        rsi.iloc[:period] = np.nan
+        out['rsi%d' % period] = rsi
+        fast, slow, signal = config['macd']
+        macd = close.ewm(span=fast,adjust=False).mean() - close.ewm(span=slow,adjust=False).mean()
+        out['macd'] = macd
+        out['macd_signal'] = macd.ewm(span=signal,adjust=False).mean()
+        out['macd_hist'] = macd - out['macd_signal']
+        frames.append(rows.assign(**out))
+    return pd.concat(frames)
+
+def timed(fn,*args,**kwargs):
+    start = time.perf_counter()
+    result = fn(*args,**kwargs)
+    return result, time.perf_counter() - start
+
+def assert_same(a,b,columns):
+    for column in columns:
+        assert np.allclose(a[column].values,b[column].values,rtol=1e-6,atol=1e-8,equal_nan=True), column
+
+def main(years=5,n_symbols=500):
+    df = closes(years,n_symbols)
+    columns = indicator_columns()
+    # The newest bar of every stock arrives after the rest
+    newest = df.groupby('Symbol',sort=False).cumcount(ascending=False) == 0
+    history, last_bar = df[~newest], df[newest]
+
+    reference, reference_time = timed(per_symbol,df)
+    grouped, grouped_time = timed(compute_indicators,df)
+    _, state = compute_indicators(history)
+    (update, _), update_time = timed(compute_indicators,last_bar,state=state)
+
+    grouped = grouped[0]
+    assert_same(grouped,reference,columns)
+    assert_same(update,grouped[newest],columns)
+
+    print('%d rows, %d symbols, %d years' % (len(df),n_symbols,years))
+    for name,elapsed in [('per symbol',reference_time),('compute_indicators',grouped_time),('resumed, one new bar each',update_time)]:
+        print('%-30s %10.2f ms %8.1fx' % (name,elapsed * 1000,reference_time / elapsed))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
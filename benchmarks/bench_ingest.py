@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+import shutil
+import resource
+import tempfile
+import multiprocessing
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,os.path.join(ROOT,'bokeh'))
+
+from pop_density_data import DATA_DIR, RESIDENTS_CSV, aggregate_residents
+
+# Rows/sec and peak memory of the residents CSV aggregation, on the bundled file
+# and on copies of it repeated n times, to check that memory stays flat as the
+# extract grows.
+# Usage: python benchmarks/bench_ingest.py [repeat factors...]
+
+# What the page did before: parse every column as object/int64, then group
+def read_all_then_group(path):
+    df = pd.read_csv(path)
+    df = df[['planning_area','resident_count','year']]
+    return df.groupby(['planning_area','year'],as_index = False)[['resident_count']].sum()
+
+def _measure(fn,path):
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    fn(path)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    return elapsed, peak / 1024
+
+# Each run gets a fresh process so that ru_maxrss is that run's own peak
+def measure(fn,path):
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        return pool.apply(_measure,(fn,path))
+
+def repeated_csv(path,factor,directory):
+    out = os.path.join(directory,'residents_x%d.csv' % factor)
+    with open(path,'rb') as src, open(out,'wb') as dst:
+        header = src.readline()
+        body = src.read()
+        if not body.endswith(b'\n'):
+            body += b'\n'
+        dst.write(header)
+        for i in range(factor):
+            dst.write(body)
+    return out
+
+def main(factors=(1,8,32)):
+    source = os.path.join(DATA_DIR,RESIDENTS_CSV)
+    n_rows = sum(1 for line in open(source)) - 1
+    directory = tempfile.mkdtemp()
+    try:
+        print('%6s %10s %-22s %10s %14s %14s' % ('factor','rows','method','seconds','rows/sec','peak RSS (MB)'))
+        for factor in factors:
+            path = repeated_csv(source,factor,directory)
+            for name,fn in [('read_csv + groupby',read_all_then_group),('aggregate_residents',aggregate_residents)]:
+                elapsed, peak = measure(fn,path)
+                rows = n_rows * factor
+                print('%6d %10d %-22s %10.3f %14.0f %14.1f' % (factor,rows,name,elapsed,rows / elapsed,peak))
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or (1,8,32))
@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,os.path.join(ROOT,'stocks'))
+
+from fake_gspread import SYMBOLS, hourly_frame, stock_codes_frame
+from stocks_data import parse_hourly, max_min_details, MaxMinTracker
+
+# All-time high/low summary of the hourly history: the per-symbol mask loop the
+# page used, the grouped pass, and the incremental tracker absorbing one new
+# trading hour. Checks that all three give the same table, and that rows
+# without a price are ignored, also when a symbol has none in a batch.
+# Usage: python benchmarks/bench_maxmin.py [days] [symbols]
+
+# What the page did before
+def generateMaxMinDetails(df):
+    max_df = df.groupby('Symbol',observed=True)[['Price']].max().reset_index()
+    min_df = df.groupby('Symbol',observed=True)[['Price']].min().reset_index()
+    unique_symbol = list(df['Symbol'].unique())
+    result = []
+    for i in unique_symbol:
+        max_value = max_df[max_df['Symbol']==i].iloc[0].iloc[1]
+        max_temp = df[ (df['Price']==max_value) & (df['Symbol']==i) ]
+        max_details = list(max_temp[['Symbol','Name','datetime','Price']].iloc[max_temp.shape[0]-1]) + ['All Time High']
+
+        min_value = min_df[min_df['Symbol']==i].iloc[0].iloc[1]
+        min_temp = df[ (df['Price']==min_value) & (df['Symbol']==i) ]
+        min_details = list(min_temp[['Symbol','Name','datetime','Price']].iloc[min_temp.shape[0]-1]) + ['All Time Low']
+
+        result.append(max_details)
+        result.append(min_details)
+    result = pd.DataFrame(result,columns=['Symbol','Name','datetime','Price','status'])
+    result.insert(2,'datetime_str',pd.to_datetime(result.pop('datetime')).dt.strftime('%Y-%m-%d %H:%M'))
+    return result
+
+def timed(fn,*args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def main(days=2500,n_symbols=len(SYMBOLS)):
+    symbols = SYMBOLS + ['S%03d' % i for i in range(n_symbols - len(SYMBOLS))]
+    df = parse_hourly(hourly_frame(days,symbols).merge(stock_codes_frame(symbols),how='left',on='Symbol'))
+    # The last trading hour (one row per symbol) arrives after the rest
+    history, last_hour = df.iloc[:-len(symbols)], df
+
+    legacy, legacy_time = timed(generateMaxMinDetails,df)
+    grouped, grouped_time = timed(max_min_details,df)
+    tracker = MaxMinTracker()
+    tracker.extend(history)
+    summary, update_time = timed(lambda: (tracker.extend(last_hour),tracker.summary())[1])
+
+    legacy = legacy.astype({'Symbol':str,'Name':str})
+    pd.testing.assert_frame_equal(grouped,legacy)
+    pd.testing.assert_frame_equal(summary,legacy)
+
+    # An hour with no prices at all, then one where every other symbol has none
+    # and the rest set new highs
+    hour = df.iloc[-len(symbols):]
+    blank = hour.assign(Price=np.nan)
+    partial = hour.assign(Price=np.where(np.arange(len(symbols)) % 2,hour['Price'].values + 100,np.nan))
+    gappy = pd.concat([df,blank,partial],ignore_index=True)
+    tracker.extend(gappy.iloc[:len(df) + len(blank)])
+    pd.testing.assert_frame_equal(tracker.summary(),legacy)
+    tracker.extend(gappy)
+    expected = generateMaxMinDetails(gappy.dropna(subset=['Price'])).astype({'Symbol':str,'Name':str})
+    pd.testing.assert_frame_equal(tracker.summary(),expected)
+    pd.testing.assert_frame_equal(max_min_details(gappy),expected)
+    assert len(max_min_details(blank)) == 0
+
+    print('%d rows, %d symbols' % (len(df),len(symbols)))
+    for name,elapsed in [('generateMaxMinDetails',legacy_time),('max_min_details',grouped_time),('MaxMinTracker, one new hour',update_time)]:
+        print('%-30s %10.2f ms %8.1fx' % (name,elapsed * 1000,legacy_time / elapsed))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,os.path.join(ROOT,'stocks'))
+
+from fake_gspread import SYMBOLS, hourly_frame, daily_frame, stock_codes_frame
+from stocks_data import parse_hourly, parse_daily
+from indicators import indicator_columns
+from stocks_plot import CHART_INDICATORS
+
+# Parse time and memory of the stocks worksheets, string frames as the sheets
+# return them vs the typed frames from stocks_data, at a multiple of the
+# history the page currently holds (250 trading days). The daily sheets'
+# indicator columns are dropped first, as the page does, since it computes them
+# from Close. The legacy daily parse only read Date; OHLC stayed strings.
+# Usage: python benchmarks/bench_parse.py [history factor]
+
+DAYS = 250
+
+# What the page did before
+def legacy_hourly(df):
+    df = df.copy()
+    df['date_string'] = df['Date'].apply(lambda x: str(x).strip())
+    df['datetime_str'] = df['Date'] + ' ' + df['Time']
+    df['datetime'] = pd.to_datetime(df['datetime_str'],format='%Y-%m-%d %H:%M')
+    return df
+
+def legacy_daily(df):
+    df = df.copy()
+    df['datetime'] = pd.to_datetime(df['Date'],format='%Y-%m-%d')
+    return df
+
+def best_of(fn,df,repeat=3):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = fn(df)
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+def megabytes(df):
+    return df.memory_usage(deep=True).sum() / 2 ** 20
+
+def main(factor=10):
+    days = DAYS * factor
+    codes = stock_codes_frame()
+    hourly = hourly_frame(days).merge(codes,how='left',on='Symbol')
+    daily = pd.concat([daily_frame(symbol,days).assign(Symbol=symbol) for symbol in SYMBOLS[:-1]]).merge(codes,how='left',on='Symbol')
+    daily = daily.drop(columns=indicator_columns(CHART_INDICATORS),errors='ignore')
+
+    print('%d trading days (%dx the current history)' % (days,factor))
+    print('%-8s %10s %-8s %10s %12s' % ('frame','rows','parser','seconds','memory (MB)'))
+    for name,raw,legacy,typed in [('hourly',hourly,legacy_hourly,parse_hourly),('daily',daily,legacy_daily,parse_daily)]:
+        old, old_time = best_of(legacy,raw)
+        new, new_time = best_of(typed,raw)
+        print('%-8s %10d %-8s %10.3f %12.1f' % (name,len(raw),'legacy',old_time,megabytes(old)))
+        print('%-8s %10d %-8s %10.3f %12.1f' % (name,len(raw),'typed',new_time,megabytes(new)))
+
+        assert (new['datetime'].values == old['datetime'].values).all()
+        for column,kind in [(c,new[c].dtype) for c in new.columns if c in raw.columns]:
+            if kind.kind == 'f':
+                assert np.allclose(new[column].values,old[column].astype(float).values,rtol=1e-6), column
+            else:
+                assert (new[column].astype(str).values == old[column].astype(str).str.strip().values).all(), column
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
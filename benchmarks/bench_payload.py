@@ -0,0 +1,59 @@
+import os
+import sys
+import json
+import time
+import numpy as np
+import pandas as pd
+from bokeh.embed import json_item
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,os.path.join(ROOT,'bokeh'))
+
+from pop_density_data import load_base_maps, prepare_base_map
+from pop_density_plot import population_map
+
+# Serialized size of the population map, checking that the page payload follows
+# the number of distinct boundaries rather than the number of (area, year) rows.
+# Usage: python benchmarks/bench_payload.py
+
+ERA_YEARS = {'98':[2000],'08':list(range(2001,2011)),'14':list(range(2011,2020))}
+
+# Long (planning area, year) table in the shape the page joins, with random totals
+def synthetic_joined(base_maps,era_years,seed=0):
+    rng = np.random.default_rng(seed)
+    frames = []
+    for era,years in era_years.items():
+        n_areas = len(base_maps[era])
+        frames.append(pd.DataFrame({
+            'planning_area':np.tile(base_maps[era]['planning_area'].values,len(years)),
+            'geom_idx':np.tile(np.arange(n_areas),len(years)),
+            'era':era,
+            'year':np.repeat(years,n_areas),
+            'total':rng.integers(0,300000,size=n_areas * len(years)),
+        }))
+    return pd.concat(frames,ignore_index=True)
+
+def document_bytes(joined,base_maps):
+    layout = population_map(joined,base_maps,start_year=int(joined['year'].max()))
+    start = time.perf_counter()
+    size = len(json.dumps(json_item(layout)))
+    return size, time.perf_counter() - start
+
+def main():
+    base_maps = {era:prepare_base_map(map_df) for era,map_df in load_base_maps().items()}
+    one_year = {era:years[-1:] for era,years in ERA_YEARS.items()}
+
+    geometry_only, _ = document_bytes(synthetic_joined(base_maps,one_year),base_maps)
+    full, elapsed = document_bytes(synthetic_joined(base_maps,ERA_YEARS),base_maps)
+    rows = sum(len(base_maps[era]) * len(years) for era,years in ERA_YEARS.items())
+    print('rows: %d, one year per era: %.1f kB, all years: %.1f kB, serialized in %.1f ms'
+          % (rows,geometry_only / 1024,full / 1024,elapsed * 1000))
+
+    # Each extra (area, year) row may only add its value, never its geometry
+    extra_rows = rows - sum(len(base_maps[era]) for era in ERA_YEARS)
+    per_row = (full - geometry_only) / extra_rows
+    print('bytes per extra (area, year) row: %.1f' % per_row)
+    assert per_row < 64, 'geometry is being repeated per year'
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import os
+import sys
+import copy
+import time
+import runpy
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,os.path.join(ROOT,'bokeh'))
+
+from pop_density_plot import year_data, VALUE_COLUMNS
+
+# The Bokeh server app's slider and Selects, driven in-process on the bundled
+# datasets/population-density files: the time per slider tick, and after every
+# tick the plotted source must hold that year's values while the model the
+# patches are computed from stays as it was built.
+# Usage: python benchmarks/bench_server.py
+
+def check_source(app,year):
+    expected = year_data(app['model'],year,app['state']['tier'])
+    for column in VALUE_COLUMNS:
+        np.testing.assert_array_equal(np.asarray(app['filtered'].data[column]),expected[column],err_msg='%d %s' % (year,column))
+
+def check_model(model,built):
+    for era,values in built.items():
+        for column,matrix in values.items():
+            np.testing.assert_array_equal(model['values'][era][column],matrix,err_msg='%s %s' % (era,column))
+
+def main():
+    app = runpy.run_path(os.path.join(ROOT,'bokeh','pop_density_server.py'),run_name='bench')
+    model, slider = app['model'], app['slider']
+    built = copy.deepcopy(model['values'])
+    years = sorted(model['year_era'])
+    # back and forth within eras and across them
+    ticks = years[::-1] + years + years[::3]
+    times = []
+    for year in ticks:
+        start = time.perf_counter()
+        slider.value = year
+        times.append(time.perf_counter() - start)
+        check_source(app,year)
+    check_model(model,built)
+
+    # a drill-down recomputes the model's values; the slider must leave those alone too
+    app['age_select'].value = '65 and over'
+    app['sex_select'].value = 'Females'
+    drilled = copy.deepcopy(model['values'])
+    for year in ticks:
+        slider.value = year
+        check_source(app,year)
+    check_model(model,drilled)
+    print('%d slider ticks, %.2f ms each at best, %.2f ms median; model unchanged' % (len(ticks),min(times) * 1000,np.median(times) * 1000))
+
+if __name__ == '__main__':
+    main()
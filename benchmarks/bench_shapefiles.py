@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+import pandas as pd
+import geopandas as gpd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,os.path.join(ROOT,'bokeh'))
+
+from pop_density_data import DATA_DIR, shapefile_path, shapefile_years, load_shapefile_totals
+
+# Loading PLN_AREA_N/TOTAL for every bundled PLAN_BDY_AGE_GENDER year.
+# Usage: python benchmarks/bench_shapefiles.py
+
+# What the page did before: full gpd.read_file per year, growing the frame each time
+def legacy_shapefile_totals(years):
+    df_shape = None
+    for year in years:
+        df = gpd.read_file(os.path.join(DATA_DIR,shapefile_path(year)))[['PLN_AREA_N','TOTAL']]
+        df['year'] = [year for i in range(df.shape[0])]
+        df_shape = df if df_shape is None else pd.concat([df_shape,df])
+    return df_shape
+
+def best_of(fn,repeat=5):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main():
+    years = shapefile_years()
+    print('years on disk: %s' % ', '.join(str(year) for year in years))
+    runs = [
+        ('gpd.read_file + concat per year',lambda: legacy_shapefile_totals(years)),
+        ('read_dbf, serial',lambda: load_shapefile_totals(years=years,max_workers=1)),
+        ('read_dbf, thread pool',lambda: load_shapefile_totals(years=years)),
+    ]
+    baseline = None
+    for name,fn in runs:
+        elapsed = best_of(fn)
+        baseline = baseline or elapsed
+        print('%-34s %9.2f ms %7.1fx' % (name,elapsed * 1000,baseline / elapsed))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,os.path.join(ROOT,'stocks'))
+
+from fake_gspread import FakeClient, synthetic_spreadsheets
+from stock_sources import SheetLoader
+
+# Page-load cost of reading the stocks worksheets, offline against a fake
+# gspread client with a fixed delay per request.
+# Usage: python benchmarks/bench_sheets.py [latency seconds]
+
+HOURLY = ['past data','Record','Stock Codes']
+
+# What the page did before: reopen the spreadsheet and read one worksheet per call
+def legacy_load(gc,gsheet_url,sheet_name):
+    sh = gc.open_by_url(gsheet_url)
+    stocks  = sh.worksheet(sheet_name)
+    records = stocks.get_all_values()
+    return pd.DataFrame(records[1:],columns=records[0])
+
+def legacy_load_all(gc,requests):
+    return {url:{name:legacy_load(gc,url,name) for name in names} for url,names in requests.items()}
+
+def timed(client,fn):
+    client.requests = 0
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start, client.requests
+
+def main(latency=0.1):
+    spreadsheets = synthetic_spreadsheets()
+    requests = {'hourly':HOURLY,'daily':list(spreadsheets['daily'])}
+    client = FakeClient(spreadsheets,latency)
+    loader = SheetLoader(client)
+
+    legacy, legacy_time, legacy_requests = timed(client,lambda: legacy_load_all(client,requests))
+    cold, cold_time, cold_requests = timed(client,lambda: loader.load(requests))
+    warm, warm_time, warm_requests = timed(client,lambda: loader.load(requests))
+
+    for url,names in requests.items():
+        for name in names:
+            pd.testing.assert_frame_equal(cold[url][name],legacy[url][name])
+            pd.testing.assert_frame_equal(warm[url][name],legacy[url][name])
+
+    print('latency per request: %.0f ms' % (latency * 1000))
+    print('%-28s %10s %10s' % ('','requests','seconds'))
+    for name,requests_made,elapsed in [('serial load_data',legacy_requests,legacy_time),('SheetLoader, cold',cold_requests,cold_time),('SheetLoader, cached',warm_requests,warm_time)]:
+        print('%-28s %10d %10.3f' % (name,requests_made,elapsed))
+
+    # One open and one batch read per spreadsheet, the spreadsheets side by side
+    assert cold_requests == 2 * len(requests), 'cold load made %d requests' % cold_requests
+    assert warm_requests == 0, 'cached load went to the network'
+
+if __name__ == '__main__':
+    main(*[float(a) for a in sys.argv[1:]])
@@ -0,0 +1,58 @@
+import os
+import sys
+import json
+import time
+import shapely
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,os.path.join(ROOT,'bokeh'))
+
+from pop_density_data import load_base_maps
+from pop_geometry import SIMPLIFY_TOLERANCES, multipolygon_coords, simplify_tiers
+
+# Vertex count and serialized size of each simplification tier per base map.
+# Checks that every tier still covers the map like the full boundaries do: the
+# areas may not overlap, or leave gaps between them, by more than MAX_SEAMS of
+# the map's area beyond what the source maps already have, and a map that is a
+# valid coverage stays one.
+# Usage: python benchmarks/bench_simplify.py
+
+MAX_SEAMS = 1e-4
+
+def json_bytes(xs,ys):
+    nested = [[[ring.tolist() for ring in rings] for rings in polys] for polys in xs + ys]
+    return len(json.dumps(nested))
+
+# Area covered by more than one polygon and area of the holes in their union
+def seams(geoms):
+    union = shapely.union_all(geoms)
+    filled = shapely.union_all(shapely.polygons(shapely.get_exterior_ring(shapely.get_parts(union))))
+    return shapely.area(geoms).sum() - union.area, filled.area - union.area, union.area
+
+def check_coverage(era,tiers):
+    overlap, gaps, area = seams(tiers[0])
+    valid = shapely.coverage_is_valid(tiers[0])
+    for tier,geoms in enumerate(tiers[1:],1):
+        tier_overlap, tier_gaps, tier_area = seams(geoms)
+        added = max(tier_overlap - overlap,0) + max(tier_gaps - gaps,0)
+        assert added <= MAX_SEAMS * area, 'map_%s tier %d: %.2g of the map in new gaps or overlaps' % (era,tier,added / area)
+        assert shapely.coverage_is_valid(geoms) or not valid, 'map_%s tier %d is no longer a valid coverage' % (era,tier)
+
+def main():
+    print('%-7s %5s %10s %10s %10s %12s %10s' % ('map','tier','tolerance','vertices','binary kB','json kB','reduction'))
+    for era,map_df in load_base_maps().items():
+        start = time.perf_counter()
+        tiers = simplify_tiers(map_df)
+        elapsed = time.perf_counter() - start
+        full = None
+        for tier,geoms in enumerate(tiers):
+            xs, ys = multipolygon_coords(geoms)
+            vertices = sum(len(ring) for polys in xs for rings in polys for ring in rings)
+            full = full or vertices
+            print('%-7s %5d %10g %10d %10.1f %12.1f %9.1fx' % ('map_' + era,tier,SIMPLIFY_TOLERANCES[tier],vertices,
+                                                               vertices * 16 / 1024,json_bytes(xs,ys) / 1024,full / vertices))
+        print('%-7s simplified in %.1f ms' % ('',elapsed * 1000))
+        check_coverage(era,tiers)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+import os
+import sys
+import json
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,os.path.join(ROOT,'bokeh'))
+
+from jsharness import node_available, run_callback, time_callback
+from pop_density_data import load_base_maps, prepare_base_map
+from pop_density_plot import SLIDER_JS, NESTED_JS, era_geometry
+from pop_geometry import nested_coords
+
+# Headless timing of the population map slider callback on synthetic data.
+# Usage: python benchmarks/bench_slider_callback.py [years] [areas]
+
+# The row-scanning callback the page used before the dense year x area model
+LEGACY_SLIDER_JS = """
+        const f = slider.value;
+        source2.data['total']=[];
+        source2.data['planning_area']=[];
+        source2.data['planning_area_sf']=[];
+        source2.data['xs']=[];
+        source2.data['ys']=[];
+
+        for (var i = 0; i <= source.data['planning_area'].length; i++){
+          if (source.data['year'][i] == f){
+            source2.data['xs'].push(source.data['xs'][i])
+            source2.data['ys'].push(source.data['ys'][i])
+            source2.data['planning_area_sf'].push(source.data['planning_area_sf'][i])
+            source2.data['planning_area'].push(source.data['planning_area'][i])
+            source2.data['total'].push(source.data['total'][i])
+          }
+        }
+        source2.change.emit();
+"""
+
+FIRST_YEAR = 2000
+
+COMMON_SETUP = """
+const Y = %d, A = %d, Y0 = %d;
+const ring = [0, 1, 1, 0];
+const names = Array.from({length: A}, (_, i) => 'AREA ' + i);
+const polys = names.map(() => [[ring]]);
+const slider = {value: Y0};
+const source2 = mock_source({});
+"""
+
+INDEXED_SETUP = """
+const totals = new Float64Array(Y * A).map((_, i) => i);
+const geometry = {all: {
+  areas: mock_source({planning_area: names}),
+  coords: [mock_source({x: new Float64Array(A * 4).map((_, i) => ring[i % 4]), y: new Float64Array(A * 4).map((_, i) => ring[i % 4])})],
+  rings: [mock_source({ring_end: new Int32Array(A).map((_, i) => 4 * (i + 1)), ring_row: new Int32Array(A).map((_, i) => i), ring_first: new Int8Array(A).fill(1)})],
+}};
+const value_sources = {all: mock_source({total: totals, density: totals, bin: new Int8Array(Y * A)})};
+const value_columns = ['total', 'density', 'bin'];
+const year_era = {}, year_offset = {};
+for (let y = 0; y < Y; y++) { year_era[Y0 + y] = 'all'; year_offset[Y0 + y] = y * A; }
+const lod = mock_source({tier: [0], era: ['']});
+const cubes = {}, era_files = {};
+"""
+INDEXED_ARGS = ['source2','geometry','value_sources','cubes','era_files','value_columns','year_era','year_offset','lod','slider']
+
+LEGACY_SETUP = """
+const rows = {planning_area: [], planning_area_sf: [], xs: [], ys: [], year: [], total: []};
+for (let y = 0; y < Y; y++) {
+  for (let a = 0; a < A; a++) {
+    rows.planning_area.push(names[a]); rows.planning_area_sf.push(names[a]);
+    rows.xs.push(polys[a]); rows.ys.push(polys[a]);
+    rows.year.push(Y0 + y); rows.total.push(y * A + a);
+  }
+}
+const source = mock_source(rows);
+"""
+LEGACY_ARGS = ['source','source2','slider']
+
+def setup(years,areas,body):
+    return COMMON_SETUP % (years,areas,FIRST_YEAR) + body
+
+def ticks(years,n=200,seed=0):
+    return [int(t) for t in np.random.default_rng(seed).integers(FIRST_YEAR,FIRST_YEAR + years,size=n)]
+
+def check_correctness(years=5,areas=4):
+    output = "{names: source2.data['planning_area'], total: source2.data['total']}"
+    year_ticks = [FIRST_YEAR + y for y in range(years)]
+    indexed = run_callback(SLIDER_JS,INDEXED_ARGS,setup(years,areas,INDEXED_SETUP),'slider.value = tick',year_ticks,output)
+    legacy = run_callback(LEGACY_SLIDER_JS,LEGACY_ARGS,setup(years,areas,LEGACY_SETUP),'slider.value = tick',year_ticks,output)
+    assert indexed == legacy, 'indexed callback disagrees with the row scan'
+
+# The xs/ys the callbacks build from an era's flat buffers, against
+# nested_coords, for every tier of the first base map
+def check_geometry():
+    map_df = prepare_base_map(next(iter(load_base_maps().values())))
+    geometry = era_geometry(map_df)
+    typed = {'x':'Float64Array','y':'Float64Array','ring_end':'Int32Array','ring_row':'Int32Array','ring_first':'Int8Array'}
+    def mock(columns):
+        return 'mock_source({%s})' % ', '.join('%s: new %s(%s)' % (column,typed[column],json.dumps(values.tolist())) for column,values in columns.items())
+    setup_js = 'const shapes = {areas: mock_source({planning_area: %s}), coords: [%s], rings: [%s]};\nconst result = {};\n' % (
+        json.dumps(list(geometry['planning_area'])),
+        ', '.join(mock({'x':flat['x'],'y':flat['y']}) for flat in geometry['tiers']),
+        ', '.join(mock({column:flat[column] for column in ['ring_end','ring_row','ring_first']}) for flat in geometry['tiers']))
+    tiers = list(range(len(geometry['tiers'])))
+    built = run_callback(NESTED_JS + 'result.value = nested(shapes, tier);',['shapes','tier','result'],setup_js,'tier = tick',tiers,'result.value')
+    for tier,(xs,ys) in zip(tiers,built):
+        expected = nested_coords(geometry['tiers'][tier],len(map_df))
+        assert [xs,ys] == json.loads(json.dumps([[[[ring.tolist() for ring in polygon] for polygon in area] for area in coords] for coords in expected]))
+
+def main(years=100,areas=1000):
+    if not node_available():
+        print('node is required to run the CustomJS callbacks headlessly')
+        return
+    check_correctness()
+    check_geometry()
+
+    print('%8s %8s %10s %16s %16s' % ('years','areas','rows','row scan (us)','indexed (us)'))
+    indexed_times = {}
+    for n_years in sorted({10,years}):
+        legacy = time_callback(LEGACY_SLIDER_JS,LEGACY_ARGS,setup(n_years,areas,LEGACY_SETUP),'slider.value = tick',ticks(n_years,n=20),repeat=3)
+        indexed = time_callback(SLIDER_JS,INDEXED_ARGS,setup(n_years,areas,INDEXED_SETUP),'slider.value = tick',ticks(n_years))
+        indexed_times[n_years] = indexed
+        print('%8d %8d %10d %16.1f %16.1f' % (n_years,areas,n_years * areas,legacy,indexed))
+
+    # The indexed callback must not grow with the number of years
+    ratio = indexed_times[max(indexed_times)] / indexed_times[min(indexed_times)]
+    assert ratio < 3, 'indexed callback scales with the number of years (%.1fx)' % ratio
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
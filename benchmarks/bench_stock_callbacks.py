@@ -0,0 +1,389 @@
+import os
+import sys
+import json
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,os.path.join(ROOT,'stocks'))
+
+from jsharness import node_available, run_callback, time_callback
+from fake_gspread import SYMBOLS, hourly_frame, daily_frame, stock_codes_frame
+from stocks_data import parse_hourly, parse_daily, candle_directions
+from stocks_plot import symbol_index, minmax_pyramid, pyramid_window, pyramid_level, level_rows, CHART_INDICATORS, DASHBOARD_JS, ZOOM_JS
+from indicators import compute_indicators, indicator_columns
+
+# Headless timing of the stocks dashboard callbacks on synthetic history: the
+# three row-scanning callbacks the page used (below, minus their console.log
+# calls), which all ran on every interaction, against the single DASHBOARD_JS
+# handler over the per-stock index. Checks that both give the same plotted data
+# for a set of stock / date range picks when the price chart is wide enough for
+# every point, and that for a 600 pixel chart the price line comes from the
+# min/max pyramid level pyramid_window picks, keeping each window's extremes.
+# Zooming into part of a window must give the level that fits the visible span
+# around it, and the reset tool's zoom back out the whole window again.
+# Usage: python benchmarks/bench_stock_callbacks.py [days]
+
+LEGACY_PRICE_JS = """
+        function formatDate(date) {
+            var d = new Date(date),
+                month = '' + (d.getMonth() + 1),
+                day = '' + d.getDate(),
+                year = d.getFullYear();
+
+            if (month.length < 2)
+                month = '0' + month;
+            if (day.length < 2)
+                day = '0' + day;
+
+            return [year, month, day].join('-');
+        }
+        const name = select.value
+
+        const f = new Date(slider.value[0])
+        const start_date = formatDate(f)
+
+        const g = new Date(slider.value[1])
+        const end_date = formatDate(g)
+
+        source2.data['datetime']=[];
+        source2.data['Price']=[];
+
+        for (var i = 0; i <= source.data['datetime'].length; i++){
+          if (source.data['date_string'][i] <= end_date && source.data['date_string'][i] >= start_date){
+              if (source.data['Name'][i] == name){
+                source2.data['datetime'].push(source.data['datetime'][i])
+                source2.data['Price'].push(source.data['Price'][i])
+              }
+          }
+        }
+        source2.change.emit();
+"""
+
+LEGACY_CANDLE_JS = """
+        function formatDate(date) {
+            var d = new Date(date),
+                month = '' + (d.getMonth() + 1),
+                day = '' + d.getDate(),
+                year = d.getFullYear();
+
+            if (month.length < 2)
+                month = '0' + month;
+            if (day.length < 2)
+                day = '0' + day;
+
+            return [year, month, day].join('-');
+        }
+        const name = select.value
+
+        const f = new Date(slider.value[0])
+        const start_date = formatDate(f)
+
+        const g = new Date(slider.value[1])
+        const end_date = formatDate(g)
+
+
+        source2.data['datetime']=[];
+        source2.data['High']=[];
+        source2.data['Low']=[];
+        source2.data['Open']=[];
+        source2.data['Close']=[];
+
+        source_increased.data['datetime']=[];
+        source_increased.data['Open']=[];
+        source_increased.data['Close']=[];
+        source_increased.data['High']=[];
+        source_increased.data['Low']=[];
+
+        source_decreased.data['datetime']=[];
+        source_decreased.data['Open']=[];
+        source_decreased.data['Close']=[];
+        source_decreased.data['High']=[];
+        source_decreased.data['Low']=[];
+
+        ema_data.data['datetime']=[];
+        ema_data.data['ema12']=[];
+        ema_data.data['ema26']=[];
+
+        for (var i = 0; i <= source.data['datetime'].length; i++){
+          if (source.data['Date'][i] <= end_date && source.data['Date'][i] >= start_date){
+              if (source.data['Name'][i] == name){
+                  source2.data['datetime'].push(source.data['datetime'][i])
+                  source2.data['High'].push(source.data['High'][i])
+                  source2.data['Low'].push(source.data['Low'][i])
+                  source2.data['Open'].push(source.data['Open'][i])
+                  source2.data['Close'].push(source.data['Close'][i])
+
+                  ema_data.data['datetime'].push(source.data['datetime'][i])
+                  ema_data.data['ema12'].push(source.data['ema12'][i])
+                  ema_data.data['ema26'].push(source.data['ema26'][i])
+
+                if (source.data['changes'][i] == true){
+                    source_increased.data['datetime'].push(source.data['datetime'][i])
+                    source_increased.data['Open'].push(source.data['Open'][i])
+                    source_increased.data['Close'].push(source.data['Close'][i])
+                    source_increased.data['High'].push(source.data['High'][i])
+                    source_increased.data['Low'].push(source.data['Low'][i])
+
+                }
+                if (source.data['changes'][i] == false){
+                    source_decreased.data['datetime'].push(source.data['datetime'][i])
+                    source_decreased.data['Open'].push(source.data['Open'][i])
+                    source_decreased.data['Close'].push(source.data['Close'][i])
+                    source_decreased.data['High'].push(source.data['High'][i])
+                    source_decreased.data['Low'].push(source.data['Low'][i])
+                }
+              }
+          }
+        }
+        source2.change.emit();
+        source_increased.change.emit();
+        source_decreased.change.emit();
+        ema_data.change.emit();
+"""
+
+LEGACY_BOLLINGER_JS = """
+        function formatDate(date) {
+            var d = new Date(date),
+                month = '' + (d.getMonth() + 1),
+                day = '' + d.getDate(),
+                year = d.getFullYear();
+
+            if (month.length < 2)
+                month = '0' + month;
+            if (day.length < 2)
+                day = '0' + day;
+
+            return [year, month, day].join('-');
+        }
+        const name = select.value
+
+        const f = new Date(slider.value[0])
+        const start_date = formatDate(f)
+
+        const g = new Date(slider.value[1])
+        const end_date = formatDate(g)
+
+
+        close_data.data['datetime']=[];
+        close_data.data['Close']=[];
+
+        sma_data.data['datetime']=[];
+        sma_data.data['sma20']=[];
+
+        bb_data.data['datetime']=[];
+        bb_data.data['bands']=[];
+
+        for (var i = 0; i <= source.data['datetime'].length; i++){
+          if (source.data['Date'][i] <= end_date && source.data['Date'][i] >= start_date){
+              if (source.data['Name'][i] == name){
+                  close_data.data['datetime'].push(source.data['datetime'][i])
+                  close_data.data['Close'].push(source.data['Close'][i])
+
+                  sma_data.data['datetime'].push(source.data['datetime'][i])
+                  sma_data.data['sma20'].push(source.data['sma20'][i])
+
+                  bb_data.data['datetime'].push(source.data['datetime'][i])
+                  bb_data.data['bands'].push(source.data['bb_lower'][i])
+              }
+          }
+        }
+        for (var i = 0; i <= reversed_source.data['datetime'].length; i++){
+          if (reversed_source.data['Date'][i] <= end_date && reversed_source.data['Date'][i] >= start_date){
+              if (reversed_source.data['Name'][i] == name){
+                  bb_data.data['datetime'].push(reversed_source.data['datetime'][i])
+                  bb_data.data['bands'].push(reversed_source.data['bb_upper'][i])
+              }
+          }
+        }
+        close_data.change.emit();
+        sma_data.change.emit();
+        bb_data.change.emit();
+"""
+
+DAILY_COLUMNS = ['datetime','Open','High','Low','Close','direction','ema12','ema26','sma20','bb_upper','bb_lower']
+
+def frames(days):
+    codes = stock_codes_frame()
+    hourly = parse_hourly(hourly_frame(days).merge(codes,how='left',on='Symbol'))
+    daily = pd.concat([daily_frame(symbol,days).assign(Symbol=symbol) for symbol in SYMBOLS[:-1]])
+    daily = parse_daily(daily.merge(codes,how='left',on='Symbol').drop(columns=indicator_columns(CHART_INDICATORS)))
+    daily, _ = compute_indicators(daily.sort_values(['Symbol','datetime'],kind='stable'),CHART_INDICATORS)
+    daily['direction'] = candle_directions(daily)
+    daily['changes'] = daily['direction'] == 1
+    return hourly, daily
+
+# JS array literal; times as ms since the epoch like Bokeh sends them
+def js_array(values,typed=None):
+    values = np.asarray(values)
+    if values.dtype.kind == 'M':
+        values = values.astype('datetime64[ms]').astype(np.float64)
+    if values.dtype.kind in 'fbi':
+        values = values.tolist()
+    else:
+        values = [str(v) for v in values]
+    literal = json.dumps(values)
+    return 'new %s(%s)' % (typed,literal) if typed else literal
+
+def js_source(name,columns,typed=False):
+    return 'const %s = %s;\n' % (name,js_mock(columns,typed))
+
+TYPED_ARRAYS = {'f':'Float64Array','M':'Float64Array','i':'Int32Array'}
+
+def js_mock(columns,typed=False):
+    body = ', '.join('%s: %s' % (json.dumps(column),js_array(values,TYPED_ARRAYS.get(np.asarray(values).dtype.kind) if typed else None)) for column,values in columns.items())
+    return 'mock_source({%s})' % body
+
+def setup(hourly,daily,hourly_levels):
+    legacy = js_source('legacy_hourly',{column:hourly[column].values for column in ['datetime','Price','date_string','Name']})
+    legacy += js_source('legacy_daily',{column:daily[column].values for column in DAILY_COLUMNS + ['Date','Name','changes']})
+    legacy += js_source('legacy_reversed',{column:daily[column].values[::-1] for column in ['datetime','bb_upper','Date','Name']})
+
+    daily_data, daily_offsets = symbol_index(daily,DAILY_COLUMNS)
+    indexed = 'const hourly = [%s];\n' % ', '.join(js_mock(data,True) for data,offsets in hourly_levels)
+    indexed += 'const hourly_offsets = %s;\n' % json.dumps([offsets for data,offsets in hourly_levels])
+    indexed += js_source('daily',daily_data,True) + 'const daily_offsets = %s;\n' % json.dumps(daily_offsets)
+
+    outputs = """
+const slider = {value: [0, 0]};
+const select = {value: ''};
+const price_plot = {inner_width: 0, x_range: {start: NaN, end: NaN}};
+const price_loaded = mock_source({name: [''], start: [0], end: [0], level: [0]});
+const price = mock_source({}), candles = mock_source({}), increased = mock_source({}), decreased = mock_source({});
+const ema = mock_source({}), close = mock_source({}), sma = mock_source({}), bands = mock_source({}), view_window = mock_source({});
+"""
+    return legacy + indexed + outputs
+
+# Callback body, argument names and the objects passed for them
+LEGACY_CALLBACKS = [
+    (LEGACY_PRICE_JS,'source source2 slider select','legacy_hourly price slider select'),
+    (LEGACY_CANDLE_JS,'source source2 source_increased source_decreased ema_data slider select','legacy_daily candles increased decreased ema slider select'),
+    (LEGACY_BOLLINGER_JS,'source reversed_source close_data sma_data bb_data slider select','legacy_daily legacy_reversed close sma bands slider select'),
+]
+DASHBOARD_ARGS = 'hourly hourly_offsets price_plot daily daily_offsets price price_loaded view_window slider select'
+ZOOM_ARGS = 'levels offsets source loaded plot slider'
+
+OUTPUT_JS = """{price: price.data, candles: candles.data, up: increased.data, down: decreased.data, ema: ema.data,
+                close: close.data, sma: sma.data, bands: bands.data}"""
+
+# The same outputs, taken from the dashboard's single daily window source: the
+# up and down candles are its rows by direction, and the band polygon is the
+# lower band forwards and then the upper band backwards
+DASHBOARD_OUTPUT_JS = """(() => {
+  const w = view_window.data, pick = (names) => Object.fromEntries(names.map((name) => [name, w[name]]));
+  const backwards = (a) => Array.from(a).reverse();
+  const candles = (direction) => Object.fromEntries(['datetime', 'Open', 'Close', 'High', 'Low'].map(
+    (name) => [name, Array.from(w[name]).filter((v, k) => w.direction[k] == direction)]));
+  return {price: price.data, candles: pick(['datetime', 'High', 'Low', 'Open', 'Close']), up: candles(1), down: candles(0),
+          ema: pick(['datetime', 'ema12', 'ema26']), close: pick(['datetime', 'Close']), sma: pick(['datetime', 'sma20']),
+          bands: {datetime: Array.from(w.datetime).concat(backwards(w.datetime)), bands: Array.from(w.bb_lower).concat(backwards(w.bb_upper))}};
+})()"""
+
+# Wraps a body so that it takes the page's argument names but is called with
+# the benchmark's objects
+def bound(code,arg_names,values):
+    return '(function (%s) {%s})(%s);\n' % (', '.join(arg_names.split()),code,', '.join(values.split()))
+
+TICK_JS = 'select.value = tick[0]; slider.value = [tick[1], tick[2]]; price_plot.inner_width = tick[3]'
+
+# After the pick, a zoom to [tick[4], tick[5]], then out to everything loaded
+ZOOM_TICK_JS = TICK_JS + '; price_plot.x_range = {start: NaN, end: NaN}; globalThis.zoom = tick.slice(4)'
+ZOOM_STEPS_JS = """
+price_plot.x_range = {start: zoom[0], end: zoom[1]};
+%s
+globalThis.zoomed = price.data;
+price_plot.x_range = {start: price_loaded.data.start[0] - 1, end: price_loaded.data.end[0] + 1};
+%s
+"""
+
+# (stock name, window start, window end, price chart width) picks, times in ms,
+# windows of 1 week to `longest` days
+def ticks(names,first,last,width,n=50,longest=365,seed=0):
+    rng = np.random.default_rng(seed)
+    day = 86400000
+    result = []
+    for i in range(n):
+        start = first + rng.integers(0,(last - first) // day) * day
+        result.append([str(rng.choice(names)),int(start),int(min(last,start + rng.integers(7,longest) * day)),width])
+    return result
+
+# The price line pyramid_window gives for a pick, in the callback's whole days
+def expected_price(hourly_levels,pick):
+    day = 86400000
+    start, end = [np.datetime64(int(t // day * day),'ms') for t in pick[1:3]]
+    data = pyramid_window(hourly_levels,pick[0],start,end + np.timedelta64(day,'ms'),2 * pick[3])
+    return {'datetime':data['datetime'].astype('datetime64[ms]').astype(np.float64).tolist(),'Price':data['Price'].tolist()}
+
+# The price line after zooming a pick into [tick[4], tick[5]]: the level that
+# fits the visible part of the window, for that and as much again each side,
+# or the whole window as before when that is already at this level
+def expected_zoom(hourly_levels,pick):
+    day = 86400000
+    t0, t1 = pick[1] // day * day, pick[2] // day * day + day
+    v0, v1 = max(t0,pick[4]), min(t1,pick[5])
+    ms = lambda t: np.datetime64(int(t),'ms')
+    level = pyramid_level(hourly_levels,pick[0],ms(v0),ms(v1),2 * pick[3])
+    if level == pyramid_level(hourly_levels,pick[0],ms(t0),ms(t1),2 * pick[3]):
+        return expected_price(hourly_levels,pick)
+    rows = level_rows(hourly_levels,pick[0],level,ms(max(t0,v0 - (v1 - v0))),ms(min(t1,v1 + (v1 - v0))))
+    raw = hourly_levels[0][0]
+    return {'datetime':raw['datetime'][rows].astype('datetime64[ms]').astype(np.float64).tolist(),'Price':raw['Price'][rows].tolist()}
+
+# Zooms into a random part of each pick's window, from a fiftieth to half of it
+def zoom_ticks(picks,seed=0):
+    rng = np.random.default_rng(seed)
+    result = []
+    for pick in picks:
+        span = (pick[2] - pick[1]) * rng.uniform(0.02,0.5)
+        start = pick[1] + rng.uniform(0,pick[2] - pick[1] - span)
+        result.append(pick + [int(start),int(start + span)])
+    return result
+
+def main(days=2500):
+    if not node_available():
+        print('node is required to run the CustomJS callbacks headlessly')
+        return
+    hourly, daily = frames(days)
+    hourly_levels = minmax_pyramid(*symbol_index(hourly,['datetime','Price']),'Price')
+    setup_js = setup(hourly,daily,hourly_levels)
+    first, last = [int(t) for t in hourly['datetime'].agg(['min','max']).values.astype('datetime64[ms]').astype(np.int64)]
+    names = list(daily['Name'].unique())
+    picks = ticks(names,first,last,1e9)
+
+    print('%d hourly rows, %d daily rows' % (len(hourly),len(daily)))
+    legacy = ''.join(bound(*callback) for callback in LEGACY_CALLBACKS)
+    dashboard = bound(DASHBOARD_JS,DASHBOARD_ARGS,DASHBOARD_ARGS)
+    expected = run_callback(legacy,[],setup_js,TICK_JS,picks[:10],OUTPUT_JS)
+    actual = run_callback(dashboard,[],setup_js,TICK_JS,picks[:10],DASHBOARD_OUTPUT_JS)
+    assert actual == expected, 'DASHBOARD_JS disagrees with the row scans'
+
+    # Windows up to the whole history on a 600 pixel chart
+    wide = ticks(names,first,last,600,n=20,longest=days * 7 // 5)
+    full = run_callback(dashboard,[],setup_js,TICK_JS,[pick[:3] + [1e9] for pick in wide],'price.data')
+    drawn = run_callback(dashboard,[],setup_js,TICK_JS,wide,'price.data')
+    for pick,everything,price in zip(wide,full,drawn):
+        assert price == expected_price(hourly_levels,pick), 'DASHBOARD_JS disagrees with pyramid_window'
+        assert len(price['Price']) <= 2 * pick[3] or len(price['Price']) < len(everything['Price'])
+        if everything['Price']:
+            assert (min(price['Price']),max(price['Price'])) == (min(everything['Price']),max(everything['Price']))
+
+    zooms = zoom_ticks(wide)
+    zoom = bound(ZOOM_JS,ZOOM_ARGS,'hourly hourly_offsets price price_loaded price_plot slider')
+    steps = run_callback(dashboard + ZOOM_STEPS_JS % (zoom,zoom),[],setup_js,ZOOM_TICK_JS,zooms,'{zoomed: globalThis.zoomed, reset: price.data}')
+    for pick,step in zip(zooms,steps):
+        assert step['zoomed'] == expected_zoom(hourly_levels,pick), 'ZOOM_JS disagrees with pyramid_level'
+        assert step['reset'] == expected_price(hourly_levels,pick), 'ZOOM_JS does not go back to the whole window'
+
+    legacy_us = time_callback(legacy,[],setup_js,TICK_JS,picks[:10],repeat=2)
+    dashboard_us = time_callback(dashboard,[],setup_js,TICK_JS,picks)
+    wide_us = time_callback(dashboard,[],setup_js,TICK_JS,wide)
+    print('%-36s %10.1f us' % ('three row-scanning callbacks',legacy_us))
+    print('%-36s %10.1f us %8.0fx' % ('DASHBOARD_JS',dashboard_us,legacy_us / dashboard_us))
+    print('%-36s %10.1f us' % ('DASHBOARD_JS, wide windows at 600px',wide_us))
+    print('%-36s %10.1f us' % ('wide windows, zoomed in and reset',time_callback(dashboard + ZOOM_STEPS_JS % (zoom,zoom),[],setup_js,ZOOM_TICK_JS,zooms)))
+    print('zooms drawn from a finer level: %d of %d' % (sum(step['zoomed'] != expected_price(hourly_levels,pick) for pick,step in zip(zooms,steps)),len(zooms)))
+    print('price points per redraw, wide windows: %d at full resolution, at most %d drawn'
+          % (max(len(price['Price']) for price in full),max(len(price['Price']) for price in drawn)))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,209 @@
+import os
+import sys
+import json
+import time
+import platform
+import itertools
+import subprocess
+import tempfile
+import numpy as np
+import pandas as pd
+import bokeh
+from bokeh.embed import json_item
+from bokeh.models import ColumnDataSource, CustomJS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,os.path.join(ROOT,'bokeh'))
+sys.path.insert(0,os.path.join(ROOT,'stocks'))
+
+from fake_gspread import FakeClient, synthetic_spreadsheets, synthetic_symbols
+from bench_documents import stocks_page
+from bench_stock_callbacks import DAILY_COLUMNS, ticks
+from jsharness import node_available, callback_setup, time_callback
+from pop_density_data import build_final_df, build_demographics, load_base_maps, prepare_base_map, join_eras
+from pop_density_plot import population_map, era_geometry, SLIDER_JS, ZOOM_JS, DRILL_JS
+from pop_cube import demographic_cube
+from stock_sources import SheetLoader
+from hourly_store import HourlyStore
+from stocks_data import parse_hourly, parse_daily, candle_directions
+from indicators import compute_indicators, indicator_columns
+from stocks_plot import symbol_index, minmax_pyramid, CHART_INDICATORS, STI_JS, DASHBOARD_JS
+
+# Offline benchmark suite for both dashboards, printed as JSON to track
+# regressions. No Google Sheets or Streamlit: the population page runs on the
+# bundled datasets/population-density files, the stocks page on synthetic
+# sheets of `symbols` stocks over `years` served by fake_gspread. Each stage is
+# timed separately (best of `repeat`), the pages' documents are serialized, and
+# their CustomJS callbacks are run headlessly under node on the serialized models.
+# Usage: python benchmarks/bench_suite.py [years] [symbols] [repeat] > results.json
+#        python benchmarks/bench_suite.py compare old.json new.json
+
+TRADING_DAYS = 261
+PLOT_WIDTH = 600
+
+# Runs fn() `repeat` times and files its best and median time under `name`;
+# returns the result of the last run
+def stage(stages,name,fn,repeat):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    stages[name] = {'ms':min(times),'median_ms':float(np.median(times))}
+    print('%-12s %-12s %10.1f ms' % ('',name,min(times)),file=sys.stderr)
+    return result
+
+# The page's CustomJS callbacks by their code, e.g. {SLIDER_JS: callback}
+def page_callbacks(layouts):
+    return {callback.code:callback for layout in layouts for callback in layout.select({'type':CustomJS})}
+
+# Microseconds per interaction of a page callback on its serialized args;
+# tick_js sets the args for one tick (see jsharness.time_callback)
+def callback_timing(callback,tick_js,callback_ticks):
+    setup_js, names = callback_setup(callback)
+    return {'us_per_tick':time_callback(callback.code,names,setup_js,tick_js,callback_ticks),'ticks':len(callback_ticks)}
+
+def serialize(layouts):
+    return [json.dumps(json_item(layout)) for layout in layouts]
+
+# Zoom ticks on an era's map: windows around its centre from the full extent in
+# to 1/64 of it, in random order so the tier changes on most ticks
+def zoom_ticks(map_df,width,n=100,seed=0):
+    minx, miny, maxx, maxy = map_df.total_bounds
+    centre, extent = (minx + maxx) / 2, maxx - minx
+    spans = extent / 2.0 ** np.random.default_rng(seed).integers(0,7,size=n)
+    return [[centre - span / 2,centre + span / 2,width] for span in spans.tolist()]
+
+# Age group and sex selections in random order, for the drill-down callback
+def drill_ticks(ages,sexes,n=50,seed=0):
+    rng = np.random.default_rng(seed)
+    return [[ages[a],sexes[x]] for a,x in zip(rng.integers(0,len(ages),size=n).tolist(),rng.integers(0,len(sexes),size=n).tolist())]
+
+def population_suite(repeat):
+    stages = {}
+    final_df, maps = stage(stages,'ingest',lambda: (build_final_df(),load_base_maps()),repeat)
+    base_maps = stage(stages,'transform',lambda: {era:prepare_base_map(map_df.copy()) for era,map_df in maps.items()},repeat)
+    joined = stage(stages,'join',lambda: join_eras(final_df,base_maps),repeat)
+    eras = list(joined['era'].unique())
+    stage(stages,'geometry',lambda: [era_geometry(base_maps[era]) for era in eras],repeat)
+    demographics = build_demographics()
+    cube = stage(stages,'cube',lambda: demographic_cube(demographics),repeat)
+    years = sorted(int(year) for year in joined['year'].unique())
+    layout = stage(stages,'sources',lambda: population_map(joined,base_maps,start_year=years[-1],plot_width=PLOT_WIDTH,cube=cube),repeat)
+    documents = stage(stages,'serialize',lambda: serialize([layout]),repeat)
+
+    results = {'data':{'years':[years[0],years[-1]],'eras':eras,'rows':len(joined)},'stages':stages,
+               'documents':{'population map':len(documents[0])},'callbacks':{}}
+    if node_available():
+        callbacks = page_callbacks([layout])
+        year_ticks = [int(year) for year in np.random.default_rng(0).choice(years,size=200)]
+        results['callbacks']['slider'] = callback_timing(callbacks[SLIDER_JS],'slider.value = tick',year_ticks)
+        results['callbacks']['zoom'] = callback_timing(callbacks[ZOOM_JS],'x_range.start = tick[0]; x_range.end = tick[1]; plot.inner_width = tick[2]',
+                                                       zoom_ticks(base_maps[eras[-1]],PLOT_WIDTH))
+        drill = callbacks[DRILL_JS]
+        results['callbacks']['drill'] = callback_timing(drill,'age_select.value = tick[0]; sex_select.value = tick[1]',
+                                                        drill_ticks(drill.args['age_select'].options,drill.args['sex_select'].options))
+    return results
+
+# What the page reads: the stock names and every daily worksheet in one batch,
+# and the hourly history synced into a new local store at `path`
+def stocks_ingest(sheets,symbols,path):
+    loader = SheetLoader(FakeClient(sheets,0))
+    loaded = loader.load({'hourly':['Stock Codes'],'daily':symbols})
+    store = HourlyStore(loader,'hourly',path)
+    try:
+        hourly = store.refresh()
+    finally:
+        store.close()
+    return hourly, loaded['hourly']['Stock Codes'], loaded['daily']
+
+def stocks_join(hourly,names,daily):
+    daily = pd.concat([frame.assign(Symbol=symbol) for symbol,frame in daily.items()])
+    return hourly.merge(names,how='left',on='Symbol'), daily.merge(names,how='left',on='Symbol')
+
+# Typed columns, the chart indicators and the candle directions, as on the page
+def stocks_transform(hourly,daily):
+    indicator_names = indicator_columns(CHART_INDICATORS)
+    daily = parse_daily(daily.drop(columns=indicator_names,errors='ignore')).sort_values(['Symbol','datetime'],kind='stable')
+    daily, _ = compute_indicators(daily,CHART_INDICATORS)
+    daily = daily.astype({name:'float32' for name in indicator_names})
+    daily['direction'] = candle_directions(daily)
+    return parse_hourly(hourly), daily
+
+# The per-stock index and min/max pyramids of the hourly, STI and daily sources
+def stocks_index(hourly,daily):
+    sti = hourly[hourly['Symbol'] == 'ES3'].assign(all='all')
+    return (minmax_pyramid(*symbol_index(hourly,['datetime','Price']),'Price'),
+            minmax_pyramid(*symbol_index(sti,['datetime','Price'],key='all'),'Price'),
+            symbol_index(daily,DAILY_COLUMNS))
+
+def stocks_sources(hourly_levels,sti_levels,daily_index):
+    return [ColumnDataSource(data) for data,offsets in hourly_levels + sti_levels] + [ColumnDataSource(daily_index[0])]
+
+def stocks_suite(years,n_symbols,repeat):
+    symbols = synthetic_symbols(n_symbols)
+    sheets = synthetic_spreadsheets('hourly','daily',days=int(years * TRADING_DAYS),symbols=symbols)
+    stages = {}
+    with tempfile.TemporaryDirectory() as cache:
+        paths = (os.path.join(cache,'hourly_%d.sqlite' % i) for i in itertools.count())
+        loaded = stage(stages,'ingest',lambda: stocks_ingest(sheets,[symbol for symbol in symbols if symbol != 'ES3'],next(paths)),repeat)
+    hourly, daily = stage(stages,'join',lambda: stocks_join(*loaded),repeat)
+    hourly, daily = stage(stages,'transform',lambda: stocks_transform(hourly,daily),repeat)
+    levels = stage(stages,'index',lambda: stocks_index(hourly,daily),repeat)
+    stage(stages,'sources',lambda: stocks_sources(*levels),repeat)
+    # The whole page script, run offline on the same sheets
+    st = stage(stages,'page',lambda: stocks_page(sheets),repeat)
+    documents = stage(stages,'serialize',lambda: serialize(st.charts),repeat)
+
+    results = {'data':{'symbols':len(symbols),'days':int(years * TRADING_DAYS),'hourly_rows':len(hourly),'daily_rows':len(daily)},'stages':stages,
+               'documents':{name:len(document) for name,document in zip(['STI','technical analysis'],documents)},'callbacks':{}}
+    if node_available():
+        callbacks = page_callbacks(st.charts)
+        first, last = [int(t) for t in hourly['datetime'].agg(['min','max']).values.astype('datetime64[ms]').astype(np.int64)]
+        results['callbacks']['sti'] = callback_timing(callbacks[STI_JS],'slider.value = [tick[1], tick[2]]; plot.inner_width = tick[3]',
+                                                      ticks(['all'],first,last,PLOT_WIDTH,n=100,longest=years * 365))
+        dashboard = callbacks[DASHBOARD_JS]
+        results['callbacks']['dashboard'] = callback_timing(dashboard,'select.value = tick[0]; slider.value = [tick[1], tick[2]]; price_plot.inner_width = tick[3]',
+                                                            ticks(dashboard.args['select'].options,first,last,PLOT_WIDTH,n=100,longest=years * 365))
+    return results
+
+def environment():
+    versions = {'python':platform.python_version(),'numpy':np.__version__,'pandas':pd.__version__,'bokeh':bokeh.__version__}
+    if node_available():
+        versions['node'] = subprocess.run(['node','--version'],capture_output=True,text=True).stdout.strip()
+    return {'platform':platform.platform(),'processor':platform.machine(),'versions':versions}
+
+def run(years=4,n_symbols=13,repeat=3):
+    print('population',file=sys.stderr)
+    population = population_suite(repeat)
+    print('stocks',file=sys.stderr)
+    stocks = stocks_suite(years,n_symbols,repeat)
+    return {'params':{'years':years,'symbols':n_symbols,'repeat':repeat},'environment':environment(),
+            'population':population,'stocks':stocks}
+
+# Stage and callback times of two result files side by side; exits non-zero
+# when anything got slower than `threshold` times its old time
+def compare(old_path,new_path,threshold=1.1):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    if old['params'] != new['params']:
+        print('different parameters: %s and %s' % (old['params'],new['params']))
+    slower = 0
+    print('%-28s %12s %12s %8s' % ('','old','new','ratio'))
+    for page in ['population','stocks']:
+        for kind,unit in [('stages','ms'),('callbacks','us_per_tick')]:
+            for name,entry in new[page][kind].items():
+                if name not in old[page][kind]:
+                    continue
+                before, after = old[page][kind][name][unit], entry[unit]
+                ratio = after / before if before else float('inf')
+                slower += ratio > threshold
+                print('%-28s %12.1f %12.1f %7.2fx%s' % ('%s %s (%s)' % (page,name,unit.split('_')[0]),before,after,ratio,'  slower' if ratio > threshold else ''))
+    return 1 if slower else 0
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['compare']:
+        sys.exit(compare(*sys.argv[2:4]))
+    print(json.dumps(run(*[int(a) for a in sys.argv[1:]]),indent=1))
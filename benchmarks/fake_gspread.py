@@ -0,0 +1,121 @@
+import re
+import time
+import threading
+import numpy as np
+import pandas as pd
+
+# In-memory stand-in for the parts of a gspread Client the stocks page uses,
+# with a fixed delay per request to mimic the Sheets API round trip. Sheet
+# contents are lists of rows of strings, header first, as get_all_values returns.
+
+# Row span of an A1 range's cell part: '1:1', 'A5:ZZ' (open ended), 'A2:D10'
+CELLS = re.compile(r'^[A-Z]*(\d+):[A-Z]*(\d*)$')
+
+# The rows of `records` that an A1 range selects (columns are not narrowed),
+# with trailing empty cells left out as the values API does
+def select_range(sheets,a1):
+    sheet, _, cells = a1.partition('!')
+    records = sheets[sheet.strip("'").replace("''","'")]
+    if cells:
+        first, last = CELLS.match(cells).groups()
+        records = records[int(first) - 1:int(last) if last else None]
+    return [row[:len(row) - next((i for i,cell in enumerate(reversed(row)) if cell != ''),len(row))] for row in records]
+
+SYMBOLS = ['D05','O39','U11','Z74','M44U','N2IU','RW0U','A17U','C38U','AU8U','CY6U','AJBU','ES3']
+
+# n symbols for scaling runs: SYMBOLS (the ones the page reads, always all of
+# them) followed by made-up codes
+def synthetic_symbols(n):
+    return SYMBOLS + ['X%03d' % i for i in range(n - len(SYMBOLS))]
+
+class FakeClient:
+    def __init__(self,spreadsheets,latency=0.1):
+        self.spreadsheets = spreadsheets
+        self.latency = latency
+        self.requests = 0
+        self.cells = 0
+        self._lock = threading.Lock()
+
+    # Counts one request and the cells it returns, after the simulated delay
+    def request(self,values=()):
+        with self._lock:
+            self.requests += 1
+            self.cells += sum(len(row) for row in values)
+        time.sleep(self.latency)
+        return values
+
+    def open_by_url(self,url):
+        self.request()
+        return FakeSpreadsheet(self,self.spreadsheets[url])
+
+class FakeSpreadsheet:
+    def __init__(self,client,sheets):
+        self.client = client
+        self.sheets = sheets
+
+    def worksheet(self,name):
+        self.client.request()
+        return FakeWorksheet(self.client,self.sheets[name])
+
+    def values_batch_get(self,ranges,params=None):
+        value_ranges = [{'range':a1,'majorDimension':'ROWS','values':select_range(self.sheets,a1)} for a1 in ranges]
+        self.client.request([row for value_range in value_ranges for row in value_range['values']])
+        return {'valueRanges':value_ranges}
+
+class FakeWorksheet:
+    def __init__(self,client,records):
+        self.client = client
+        self.records = records
+
+    def get(self,cells):
+        return self.client.request(select_range({'':self.records},"''!" + cells))
+
+    def get_all_values(self):
+        return self.client.request([list(row) for row in self.records])
+
+def _records(frame):
+    return [list(frame.columns)] + frame.astype(str).values.tolist()
+
+# Hourly prices in the layout of the 'past data'/'Record' worksheets: trading
+# hours 09:00-17:00 on weekdays, a random walk per symbol
+def hourly_frame(days=250,symbols=SYMBOLS,seed=0,start='2019-11-19'):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start,periods=days)
+    stamps = (dates.values[:,None] + np.arange(9,18).astype('timedelta64[h]')[None,:]).ravel()
+    frames = []
+    for symbol in symbols:
+        price = np.round(np.abs(10 + np.cumsum(rng.normal(0,0.05,len(stamps)))),2)
+        frames.append(pd.DataFrame({'Symbol':symbol,'stamp':stamps,'Price':price}))
+    frame = pd.concat(frames).sort_values('stamp',kind='stable')
+    return pd.DataFrame({'Date':frame['stamp'].dt.strftime('%Y-%m-%d'),'Time':frame['stamp'].dt.strftime('%H:%M'),
+                         'Symbol':frame['Symbol'].values,'Price':frame['Price'].map('{:.2f}'.format).values})
+
+# Daily OHLC bars with the indicator columns the daily worksheets carry
+def daily_frame(symbol,days=250,seed=0,start='2019-11-19'):
+    rng = np.random.default_rng([seed,sum(map(ord,symbol))])
+    close = pd.Series(np.abs(10 + np.cumsum(rng.normal(0,0.1,days))))
+    open_ = close.shift(1).fillna(close.iloc[0]) + rng.normal(0,0.05,days)
+    high = np.maximum(open_,close) + np.abs(rng.normal(0,0.05,days))
+    low = np.minimum(open_,close) - np.abs(rng.normal(0,0.05,days))
+    sma = close.rolling(20,min_periods=1).mean()
+    std = close.rolling(20,min_periods=1).std().fillna(0)
+    frame = pd.DataFrame({'Date':pd.bdate_range(start,periods=days).strftime('%Y-%m-%d'),'Open':open_,'High':high,'Low':low,'Close':close,
+                          'ema12':close.ewm(span=12,adjust=False).mean(),'ema26':close.ewm(span=26,adjust=False).mean(),
+                          'sma20':sma,'bb_upper':sma + 2 * std,'bb_lower':sma - 2 * std})
+    for column in frame.columns[1:]:
+        frame[column] = frame[column].map('{:.4f}'.format)
+    return frame
+
+def stock_codes_frame(symbols=SYMBOLS):
+    names = {'ES3':'STI ETF'}
+    return pd.DataFrame({'Symbol':symbols,'Name':[names.get(symbol,'STOCK ' + symbol) for symbol in symbols]})
+
+# {url: {worksheet: records}} for the two spreadsheets the page reads; 'Record'
+# holds the last `record_days` days of the hourly history and 'past data' the rest
+def synthetic_spreadsheets(hourly_url='hourly',daily_url='daily',days=250,record_days=20,symbols=SYMBOLS,seed=0):
+    hourly = hourly_frame(days,symbols,seed)
+    cut = hourly['Date'] >= sorted(hourly['Date'].unique())[-record_days]
+    return {
+        hourly_url:{'past data':_records(hourly[~cut]),'Record':_records(hourly[cut]),'Stock Codes':_records(stock_codes_frame(symbols))},
+        daily_url:{symbol:_records(daily_frame(symbol,days,seed)) for symbol in symbols if symbol != 'ES3'},
+    }
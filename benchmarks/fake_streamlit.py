@@ -0,0 +1,41 @@
+import sys
+import types
+import runpy
+
+# Stand-in for the streamlit calls the pages make, so that a page script can be
+# run offline: charts and dataframes are recorded instead of rendered, and
+# st.cache does not cache.
+
+class _Section:
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exc):
+        return False
+
+def fake_streamlit(secrets,query_params=None):
+    st = types.ModuleType('streamlit')
+    st.secrets = secrets
+    st.experimental_get_query_params = lambda: dict(query_params or {})
+    st.charts = []
+    st.frames = []
+    st.cache = lambda *args,**kwargs: args[0] if args and callable(args[0]) else (lambda fn: fn)
+    st.title = st.write = st.markdown = st.text = lambda *args,**kwargs: None
+    st.dataframe = lambda data=None,**kwargs: st.frames.append(data)
+    st.bokeh_chart = lambda figure,**kwargs: st.charts.append(figure)
+    st.expander = lambda *args,**kwargs: _Section()
+    return st
+
+# Runs a page script with `modules` ({name: module}) in place of its imports
+# and returns the script's globals
+def run_page(path,modules):
+    saved = {name:sys.modules.get(name) for name in modules}
+    sys.modules.update(modules)
+    try:
+        return runpy.run_path(path,run_name='__main__')
+    finally:
+        for name,module in saved.items():
+            if module is None:
+                sys.modules.pop(name,None)
+            else:
+                sys.modules[name] = module
@@ -0,0 +1,116 @@
+import json
+import shutil
+import subprocess
+from bokeh.core.json_encoder import serialize_json
+
+# Runs CustomJS callback bodies headlessly under node, against plain JS objects
+# standing in for the Bokeh models they receive as args.
+
+MOCK_JS = """
+function mock_source(data) {
+  return {data: data, change: {emit() {}}};
+}
+function time_ticks(fn, ticks, repeat) {
+  fn(ticks[0]);
+  let best = Infinity;
+  for (let r = 0; r < repeat; r++) {
+    const start = process.hrtime.bigint();
+    for (const tick of ticks) {
+      fn(tick);
+    }
+    best = Math.min(best, Number(process.hrtime.bigint() - start) / 1e3 / ticks.length);
+  }
+  return best;
+}
+"""
+
+# Rebuilds Bokeh models from their JSON (see callback_setup) the way BokehJS
+# hands them to a CustomJS callback: references become the model objects,
+# base64 arrays become typed arrays, and every model gets a no-op change.emit
+MODELS_JS = """
+const TYPED = {float64: Float64Array, float32: Float32Array, int32: Int32Array, uint32: Uint32Array,
+               int16: Int16Array, uint16: Uint16Array, int8: Int8Array, uint8: Uint8Array, bool: Uint8Array};
+function bokeh_args(doc, names) {
+  const objects = {};
+  const decode = (value) => {
+    if (Array.isArray(value)) {
+      return value.map(decode);
+    }
+    if (value === null || typeof value != 'object') {
+      return value;
+    }
+    if ('__ndarray__' in value) {
+      const bytes = Buffer.from(value.__ndarray__, 'base64');
+      return new TYPED[value.dtype](bytes.buffer.slice(bytes.byteOffset, bytes.byteOffset + bytes.length));
+    }
+    if (Object.keys(value).length == 1 && value.id in doc.models) {
+      return model(value.id);
+    }
+    return Object.fromEntries(Object.entries(value).map(([k, v]) => [k, decode(v)]));
+  };
+  const model = (id) => {
+    if (!(id in objects)) {
+      objects[id] = {change: {emit() {}}};
+      Object.assign(objects[id], decode(doc.models[id]));
+    }
+    return objects[id];
+  };
+  return names.map((name) => decode(doc.args[name]));
+}
+"""
+
+def node_available():
+    return shutil.which('node') is not None
+
+# Runs a script (read from stdin, so setups of any size fit) and returns the
+# JSON printed on its last line
+def _run_node(script):
+    result = subprocess.run(['node'],input=script,capture_output=True,text=True,check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+# setup_js defines every name in arg_names (plus anything the tick function
+# needs); tick_js is the body of `function (tick)` that updates the args for
+# one interaction before the callback runs. Returns microseconds per tick.
+def time_callback(code,arg_names,setup_js,tick_js,ticks,repeat=5):
+    script = MOCK_JS + setup_js + """
+const callback = new Function(%s);
+const us = time_ticks(function (tick) { %s; callback(%s); }, %s, %d);
+console.log(JSON.stringify({us_per_tick: us}));
+""" % (', '.join(json.dumps(name) for name in list(arg_names) + [code]),tick_js,', '.join(arg_names),json.dumps(ticks),repeat)
+    return _run_node(script)['us_per_tick']
+
+# Evaluates the callback once per tick and returns a JSON snapshot of the
+# expression `output_js` taken right after each, for correctness checks
+def run_callback(code,arg_names,setup_js,tick_js,ticks,output_js):
+    script = MOCK_JS + setup_js + """
+const callback = new Function(%s);
+const out = [];
+const snapshot = (value) => JSON.stringify(value, (k, v) => ArrayBuffer.isView(v) ? Array.from(v) : v);
+for (const tick of %s) { %s; callback(%s); out.push(snapshot(%s)); }
+console.log('[' + out.join(',') + ']');
+""" % (', '.join(json.dumps(name) for name in list(arg_names) + [code]),json.dumps(ticks),tick_js,', '.join(arg_names),output_js)
+    return _run_node(script)
+
+# run_callback for callbacks that finish asynchronously: after each tick the
+# promise returned by settled(), which setup_js defines, is awaited before the
+# snapshot is taken
+def run_async_callback(code,arg_names,setup_js,tick_js,ticks,output_js):
+    script = MOCK_JS + setup_js + """
+const callback = new Function(%s);
+const snapshot = (value) => JSON.stringify(value, (k, v) => ArrayBuffer.isView(v) ? Array.from(v) : v);
+(async () => {
+  const out = [];
+  for (const tick of %s) { %s; callback(%s); await settled(); await null; out.push(snapshot(%s)); }
+  console.log('[' + out.join(',') + ']');
+})();
+""" % (', '.join(json.dumps(name) for name in list(arg_names) + [code]),json.dumps(ticks),tick_js,', '.join(arg_names),output_js)
+    return _run_node(script)
+
+# Setup script defining each of a CustomJS callback's args as BokehJS would
+# pass it, from the models as they are serialized into the document. Returns
+# the script and the arg names.
+def callback_setup(callback):
+    models = {model.id:model.to_json(True) for model in callback.references() if model is not callback}
+    names = sorted(callback.args)
+    doc = serialize_json({'models':models,'args':callback.to_json(True)['args']})
+    return MODELS_JS + 'const [%s] = bokeh_args(%s, %s);\n' % (', '.join(names),doc,json.dumps(names)), names
@@ -0,0 +1,114 @@
+import re
+import numpy as np
+import pandas as pd
+
+from pop_density_data import UNSPLIT
+
+# Dense demographic cube for the population density page: resident counts as
+# one int32 array over (subzone, age group, sex, year), every dimension
+# integer-coded, built once from the long table of load_demographics().
+# Subzones are numbered area by area, so an area's subzones are one contiguous
+# run and the area roll-up is a single np.add.reduceat, kept as area_counts.
+# Any slice or roll-up is then a weighted sum over axes, e.g. the females aged
+# 65 and over of each area in 2010:
+#     area_totals(cube,'65 and over','Females')[:,list(cube['years']).index(2010)]
+# Counts a source does not split by sex (see UNSPLIT) have their own sex slot;
+# a selection that needs the split they lack comes out as NaN, not as a low count.
+
+SEXES = ['Males','Females',UNSPLIT]
+
+# Age selections besides the single age groups, by [first, last) year of age
+AGE_BANDS = {'All ages':(0,None),'0 to 14':(0,15),'15 to 64':(15,65),'65 and over':(65,None)}
+
+# Sex selections: the weight of each SEXES slot, and the slots whose counts
+# make the selection unknown
+SEX_OPTIONS = {'Both sexes':([1,1,1],[0,0,0]),'Males':([1,0,0],[0,0,1]),'Females':([0,1,0],[0,0,1])}
+
+ALL_AGES, BOTH_SEXES = 'All ages', 'Both sexes'
+
+def age_lower(label):
+    return int(re.match(r'\d+',label).group())
+
+# '85_and_over' -> '85 and over', as the age groups are offered in the Select
+def age_option(label):
+    return label.replace('_',' ')
+
+def demographic_cube(demographics):
+    areas_subzones = pd.MultiIndex.from_arrays([demographics['planning_area'].astype(str),demographics['subzone'].astype(str)])
+    subzone_codes, subzones = areas_subzones.factorize(sort=True)
+    areas, subzone_area = np.unique(subzones.get_level_values(0),return_inverse=True)
+    labels = demographics['age_group'].astype(str).values
+    age_groups = np.array(sorted(set(labels),key=age_lower))
+    age_codes = pd.Categorical(labels,categories=age_groups).codes
+    sex_codes = pd.Categorical(demographics['sex'].astype(str),categories=SEXES).codes
+    if (sex_codes < 0).any():
+        raise ValueError('unknown sex in demographics: %s' % sorted(set(demographics['sex'].astype(str)) - set(SEXES)))
+    years, year_codes = np.unique(demographics['year'].values,return_inverse=True)
+
+    shape = (len(subzones),len(age_groups),len(SEXES),len(years))
+    cells = np.ravel_multi_index((subzone_codes,age_codes,sex_codes,year_codes),shape)
+    counts = np.bincount(cells,weights=demographics['resident_count'].values,minlength=int(np.prod(shape)))
+    counts = counts.astype(np.int32).reshape(shape)
+    known = np.zeros((len(subzones),len(years)),dtype=bool)
+    known[subzone_codes,year_codes] = True
+
+    starts = np.flatnonzero(np.r_[True,subzone_area[1:] != subzone_area[:-1]])
+    return {
+        'areas':areas,
+        'subzones':np.asarray(subzones.get_level_values(1)),
+        'subzone_area':subzone_area.astype(np.int32),
+        'age_groups':age_groups,
+        'sexes':np.array(SEXES),
+        'years':years,
+        'counts':counts,
+        'known':known,
+        'area_counts':np.add.reduceat(counts,starts,axis=0,dtype=np.int32),
+        'area_known':np.logical_or.reduceat(known,starts,axis=0),
+    }
+
+# Every age selection: AGE_BANDS, then each age group of the cube
+def age_options(cube):
+    return list(AGE_BANDS) + [age_option(label) for label in cube['age_groups']]
+
+# 0/1 weight of each of the cube's age groups for an age selection
+def age_weights(cube,option):
+    if option in AGE_BANDS:
+        first, last = AGE_BANDS[option]
+        lower = np.array([age_lower(label) for label in cube['age_groups']])
+        return ((lower >= first) & (lower < (np.inf if last is None else last))).astype(np.int32)
+    return np.array([age_option(label) == option for label in cube['age_groups']],dtype=np.int32)
+
+# Residents of a selection per cell of `counts` (... x age group x sex) from
+# pre-built weights: NaN where the cell has no data or its counts are not split
+# the way the selection needs
+def selection_counts(counts,known,ages,sexes,unknown):
+    totals = np.tensordot(counts,np.outer(ages,sexes),axes=([-2,-1],[0,1])).astype(np.float64)
+    missing = np.tensordot(counts,np.outer(ages,unknown),axes=([-2,-1],[0,1])) > 0
+    totals[~known | missing] = np.nan
+    return totals
+
+def _selection(cube,counts,known,age,sex):
+    sexes, unknown = SEX_OPTIONS[sex]
+    return selection_counts(np.moveaxis(counts,-1,1),known,age_weights(cube,age),sexes,unknown)
+
+# (area, year) residents of an age and sex selection, areas as cube['areas']
+def area_totals(cube,age=ALL_AGES,sex=BOTH_SEXES):
+    return _selection(cube,cube['area_counts'],cube['area_known'],age,sex)
+
+# (subzone, year) residents of an age and sex selection, subzones as cube['subzones']
+def subzone_totals(cube,age=ALL_AGES,sex=BOTH_SEXES):
+    return _selection(cube,cube['counts'],cube['known'],age,sex)
+
+# The cube's area counts for the rows of one base map and a list of years, as
+# (year, area, age group, sex) with whether each (year, area) has data; areas
+# or years the cube lacks have no data
+def era_counts(cube,planning_areas,years):
+    def lookup(values,keys):
+        index = np.clip(np.searchsorted(values,keys),0,len(values) - 1)
+        return index, values[index] == keys
+    rows, has_row = lookup(cube['areas'],np.asarray(planning_areas).astype(str))
+    cols, has_col = lookup(cube['years'],np.asarray(years))
+    counts = np.ascontiguousarray(cube['area_counts'][rows][:,:,:,cols].transpose(3,0,1,2))
+    known = cube['area_known'][rows][:,cols].T & has_col[:,np.newaxis] & has_row[np.newaxis,:]
+    counts[~known] = 0
+    return counts, known
@@ -0,0 +1,402 @@
+import os
+import re
+import glob
+import json
+import time
+import struct
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+from pop_geometry import SIMPLIFY_TOLERANCES, simplify_tiers
+
+# Population density ETL and its on-disk columnar cache.
+# Run `python bokeh/pop_density_data.py` to (re)build the cache ahead of time;
+# load_population_data() rebuilds it on its own whenever a source file changes.
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),'datasets','population-density')
+CACHE_DIR = 'cache'
+CACHE_VERSION = 5
+
+RESIDENTS_CSV = 'singapore-residents-by-planning-area-subzone-age-group-and-sex-june-2000-onwards.csv'
+DWELLING_CSV = 'planning-area-subzone-age-group-sex-and-type-of-dwelling-june-2011-2019.csv'
+# Years from the dwelling CSV onwards come from it; every PLAN_BDY_AGE_GENDER_<year>
+# shapefile found on disk for an earlier year is used for that year's totals
+DWELLING_FIRST_YEAR = 2011
+SHAPEFILE_GLOB = 'PLAN_BDY_AGE_GENDER_*.shp'
+SHAPEFILE_COLUMNS = ['PLN_AREA_N','TOTAL']
+
+BASE_MAPS = {
+    '98':'maps/map_98_edited.geojson',
+    '08':'maps/map_08_edited.geojson',
+    '14':'maps/map_14_edited.geojson',
+    '19':'maps/map_19.geojson',
+}
+
+# map_19 comes straight from the URA KML export; give it the same columns as the edited maps
+BASE_MAP_COLUMNS = {
+    '19':{'PLN_AREA_N':'planning_area','PLN_AREA_C':'planning_area_sf','REGION_N':'planning_region','REGION_C':'planning_region_sf'},
+}
+
+# Base map each year is drawn on, as (first year, era): a year uses the last
+# entry starting at or before it. Add a year range or a map era here, e.g.
+# (2020,'19') to draw 2020 onwards on the 2019 boundaries.
+MAP_ERAS = [
+    (2000,'98'),
+    (2001,'08'),
+    (2011,'14'),
+]
+
+def shapefile_path(year):
+    return 'PLAN_BDY_AGE_GENDER_' + str(year) + '.shp'
+
+def shapefile_years(data_dir=DATA_DIR):
+    years = []
+    for path in glob.glob(os.path.join(data_dir,SHAPEFILE_GLOB)):
+        match = re.search(r'_(\d{4})\.shp$',path)
+        if match and int(match.group(1)) < DWELLING_FIRST_YEAR:
+            years.append(int(match.group(1)))
+    return sorted(years)
+
+# Only the attribute table of each shapefile is used
+def dbf_path(year):
+    return shapefile_path(year)[:-len('.shp')] + '.dbf'
+
+# The 2011-2019 dwelling CSV is optional: without it those years are left out
+def has_dwelling_csv(data_dir=DATA_DIR):
+    return os.path.exists(os.path.join(data_dir,DWELLING_CSV))
+
+# Every file the ETL reads, relative to the data directory
+def source_files(data_dir=DATA_DIR):
+    files = [RESIDENTS_CSV] + ([DWELLING_CSV] if has_dwelling_csv(data_dir) else [])
+    files += [dbf_path(year) for year in shapefile_years(data_dir)]
+    files += list(BASE_MAPS.values())
+    return files
+
+def file_digest(path,chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path,'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size),b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+# Content hashes of all sources. A file whose size and mtime match the previous
+# manifest reuses its recorded digest, so an unchanged tree is never re-read.
+def source_hashes(data_dir=DATA_DIR,previous=None):
+    previous = previous or {}
+    hashes = {}
+    for name in source_files(data_dir):
+        stat = os.stat(os.path.join(data_dir,name))
+        old = previous.get(name)
+        if old and old['size'] == stat.st_size and old['mtime_ns'] == stat.st_mtime_ns:
+            hashes[name] = old
+        else:
+            hashes[name] = {'size':stat.st_size,'mtime_ns':stat.st_mtime_ns,'sha256':file_digest(os.path.join(data_dir,name))}
+    return hashes
+
+# Chunk size for aggregate_residents; peak memory is bounded by one chunk plus
+# the running (area, year) totals, however large the extract is
+CSV_CHUNK_ROWS = 250000
+RESIDENT_DTYPES = {'planning_area':'category','year':'int32','resident_count':'int32'}
+
+# Sum resident_count per planning_area and year of a residents extract (the
+# 2000 onwards file, or the 2011-2019 file broken down by dwelling type).
+# Only the three needed columns are parsed, with compact dtypes, one chunk at a
+# time; each chunk is reduced and folded into the running totals.
+def aggregate_residents(path,chunk_rows=CSV_CHUNK_ROWS):
+    totals = None
+    reader = pd.read_csv(path,usecols=list(RESIDENT_DTYPES),dtype=RESIDENT_DTYPES,chunksize=chunk_rows)
+    for chunk in reader:
+        part = chunk.groupby(['planning_area','year'],observed=True)['resident_count'].sum().astype('int64')
+        part.index = part.index.set_levels(part.index.levels[0].astype(str),level=0)
+        totals = part if totals is None else totals.add(part,fill_value=0)
+    result = totals.astype('int64').rename('resident_count').reset_index()
+    return result.sort_values(['planning_area','year'],ignore_index=True)
+
+# Record layout of a dBASE (.dbf) table from its header: the numpy fields of a
+# record and the dBASE type letter of each column
+def _dbf_fields(data):
+    fields = [('deleted','S1')]
+    types = {}
+    pos = 32
+    while data[pos] != 0x0D:
+        name = data[pos:pos + 11].split(b'\0')[0].decode('ascii')
+        types[name] = chr(data[pos + 11])
+        fields.append((name,'S' + str(data[pos + 16])))
+        pos += 32
+    return fields, types
+
+def dbf_columns(path):
+    with open(path,'rb') as f:
+        return list(_dbf_fields(f.read())[1])
+
+# Selected columns of a dBASE (.dbf) table, the attribute half of a shapefile.
+# Records are fixed width, so the whole file is viewed as one numpy record array
+# and only the requested fields are decoded; the geometry (.shp) is never read.
+def read_dbf(path,columns):
+    with open(path,'rb') as f:
+        data = f.read()
+    n_records, header_len, record_len = struct.unpack('<IHH',data[4:12])
+    fields, types = _dbf_fields(data)
+    records = np.frombuffer(data,dtype=np.dtype(fields),count=n_records,offset=header_len)
+    records = records[records['deleted'] != b'*']
+    frame = {}
+    for name in columns:
+        values = np.char.strip(np.char.decode(records[name],'latin-1'))
+        frame[name] = values.astype(float) if types[name] in 'NF' else values.astype(object)
+    return pd.DataFrame(frame)
+
+def read_shapefile_totals(data_dir,year):
+    df = read_dbf(os.path.join(data_dir,dbf_path(year)),SHAPEFILE_COLUMNS)
+    df['year'] = year
+    return df
+
+# PLN_AREA_N/TOTAL of every shapefile year, read in parallel and concatenated once
+def load_shapefile_totals(data_dir=DATA_DIR,years=None,max_workers=None):
+    years = shapefile_years(data_dir) if years is None else years
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        frames = list(pool.map(lambda year: read_shapefile_totals(data_dir,year),years))
+    df_shape = pd.concat(frames,ignore_index=True)
+    df_shape.columns = ['planning area','total','year']
+    return df_shape[['planning area','year','total']]
+
+# Breakdown kept for the demographic cube (see pop_cube.py). Counts a source
+# does not split by subzone or sex (the shapefiles have neither) are filed
+# under UNSPLIT.
+DEMOGRAPHIC_KEYS = ['planning_area','subzone','age_group','sex','year']
+DEMOGRAPHIC_DTYPES = {'planning_area':'category','subzone':'category','age_group':'category','sex':'category','year':'int32','resident_count':'int32'}
+UNSPLIT = 'Not split'
+
+# Shapefile age columns: BET0TO4 is the CSVs' 0_to_4, OVER85 their 85_and_over
+SHAPEFILE_AGE = re.compile(r'^BET(\d+)TO(\d+)$|^OVER(\d+)$')
+
+def shapefile_age_group(column):
+    match = SHAPEFILE_AGE.match(column)
+    return '%s_to_%s' % match.group(1,2) if match.group(1) else match.group(3) + '_and_over'
+
+# resident_count per DEMOGRAPHIC_KEYS of a residents extract, read like
+# aggregate_residents one chunk at a time and folded into the running totals;
+# rows that differ only in a column left out (the dwelling type) are summed.
+# Area names are upper case, as in build_final_df.
+def aggregate_demographics(path,chunk_rows=CSV_CHUNK_ROWS):
+    totals = None
+    labels = list(range(len(DEMOGRAPHIC_KEYS) - 1))
+    for chunk in pd.read_csv(path,usecols=list(DEMOGRAPHIC_DTYPES),dtype=DEMOGRAPHIC_DTYPES,chunksize=chunk_rows):
+        part = chunk.groupby(DEMOGRAPHIC_KEYS,observed=True)['resident_count'].sum().astype('int64')
+        part.index = part.index.set_levels([part.index.levels[level].astype(str) for level in labels],level=labels)
+        totals = part if totals is None else totals.add(part,fill_value=0)
+    result = totals.sort_index().astype('int64').rename('resident_count').reset_index()
+    result['planning_area'] = result['planning_area'].str.upper()
+    return result
+
+# The age columns of one shapefile year, one row per planning area and age group
+def read_shapefile_ages(data_dir,year):
+    path = os.path.join(data_dir,dbf_path(year))
+    ages = [column for column in dbf_columns(path) if SHAPEFILE_AGE.match(column)]
+    df = read_dbf(path,['PLN_AREA_N'] + ages).melt(id_vars='PLN_AREA_N',var_name='age_group',value_name='resident_count')
+    return pd.DataFrame({'planning_area':df['PLN_AREA_N'],'subzone':UNSPLIT,'age_group':df['age_group'].map(shapefile_age_group),
+                         'sex':UNSPLIT,'year':year,'resident_count':df['resident_count']})
+
+def load_shapefile_ages(data_dir=DATA_DIR,years=None,max_workers=None):
+    years = shapefile_years(data_dir) if years is None else years
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return pd.concat(pool.map(lambda year: read_shapefile_ages(data_dir,year),years),ignore_index=True)
+
+# The long table behind the demographic cube, from the same sources and years
+# as build_final_df
+def build_demographics(data_dir=DATA_DIR):
+    residents = aggregate_demographics(os.path.join(data_dir,RESIDENTS_CSV))
+    residents = residents.loc[~(residents['year']==2005)]
+    parts = [residents,load_shapefile_ages(data_dir)]
+    if has_dwelling_csv(data_dir):
+        parts.append(aggregate_demographics(os.path.join(data_dir,DWELLING_CSV)))
+    return pd.concat(parts,ignore_index=True).astype(DEMOGRAPHIC_DTYPES)
+
+def build_final_df(data_dir=DATA_DIR):
+    ### 2000 - 2004
+    # Exclude 2005 as 2005 data does not have some locations
+    result = aggregate_residents(os.path.join(data_dir,RESIDENTS_CSV))
+    result = result.loc[~(result['year']==2005)]
+    result.columns = ['planning area','year','total']
+    result['planning area'] = result['planning area'].str.upper()
+
+    ### 2005 - 2010
+    df_shape = load_shapefile_totals(data_dir)
+
+    ### 2011 - 2019
+    frames = [result,df_shape]
+    if has_dwelling_csv(data_dir):
+        result2 = aggregate_residents(os.path.join(data_dir,DWELLING_CSV))
+        result2.columns = ['planning area','year','total']
+        result2['planning area'] = result2['planning area'].str.upper()
+        frames.append(result2)
+
+    ## Concatenate all together
+    final_df = pd.concat(frames,ignore_index=True)
+    final_df['year'] = final_df['year'].astype('int32')
+    final_df['total'] = final_df['total'].astype('int64')
+    return final_df
+
+def load_base_maps(data_dir=DATA_DIR):
+    base_maps = {}
+    for era,path in BASE_MAPS.items():
+        map_df = gpd.read_file(os.path.join(data_dir,path))
+        if era in BASE_MAP_COLUMNS:
+            map_df = map_df.rename(columns=BASE_MAP_COLUMNS[era])[['planning_area','planning_area_sf','planning_region','planning_region_sf','geometry']]
+        base_maps[era] = map_df
+    return base_maps
+
+def _cache_path(data_dir,name):
+    return os.path.join(data_dir,CACHE_DIR,name)
+
+def _read_manifest(data_dir):
+    try:
+        with open(_cache_path(data_dir,'manifest.json')) as f:
+            return json.load(f)
+    except (OSError,ValueError):
+        return None
+
+# Write each file to a uniquely named temp file next to its final name and rename
+# it into place, so a reader never sees a half-written file and two processes
+# building the cache at once never write to the same temp file. The manifest goes
+# last and marks the cache valid.
+def _replace_file(path,write):
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path),prefix=os.path.basename(path) + '.',suffix='.tmp',delete=False) as f:
+        tmp = f.name
+    try:
+        write(tmp)
+        os.replace(tmp,path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+# Geometry columns are stored as plain WKB: decoding them with shapely is a few
+# milliseconds, while gpd.read_parquet spends most of its time on CRS metadata.
+def _write_frame(data_dir,name,frame):
+    path = _cache_path(data_dir,name + '.parquet')
+    frame = pd.DataFrame(frame)
+    for column in frame.columns:
+        if frame[column].dtype.name == 'geometry':
+            frame[column] = shapely.to_wkb(frame[column].values)
+    _replace_file(path,lambda tmp: frame.to_parquet(tmp,index=False))
+
+def _read_frame(data_dir,name,crs=None):
+    frame = pd.read_parquet(_cache_path(data_dir,name + '.parquet'))
+    if 'geometry' in frame.columns:
+        for column in tier_columns(len(SIMPLIFY_TOLERANCES)):
+            frame[column] = gpd.GeoSeries(shapely.from_wkb(frame[column].values),crs=crs)
+        frame = gpd.GeoDataFrame(frame,geometry=shapely.from_wkb(frame['geometry'].values),crs=crs)
+    return frame
+
+# Column holding each simplification tier; tier 0 is the original 'geometry'
+def tier_column(tier):
+    return 'geometry' if tier == 0 else 'geometry_t' + str(tier)
+
+def tier_columns(n_tiers):
+    return [tier_column(tier) for tier in range(1,n_tiers)]
+
+def add_simplified_tiers(map_df):
+    for tier,geoms in enumerate(simplify_tiers(map_df)):
+        if tier > 0:
+            map_df[tier_column(tier)] = gpd.GeoSeries(geoms,index=map_df.index,crs=map_df.crs)
+    return map_df
+
+# Land area of each planning area in km2, measured in SVY21 / Singapore TM
+# (metres) rather than on the lon/lat degrees the maps are stored in
+AREA_CRS = 'EPSG:3414'
+
+def add_projected_areas(map_df):
+    map_df['area_km2'] = map_df.geometry.to_crs(AREA_CRS).area.values / 1e6
+    return map_df
+
+# Everything derived from a base map's geometry, done once when the cache is built
+def prepare_base_map(map_df):
+    return add_projected_areas(add_simplified_tiers(map_df))
+
+def build_cache(data_dir=DATA_DIR,hashes=None):
+    os.makedirs(os.path.join(data_dir,CACHE_DIR),exist_ok=True)
+    hashes = hashes or source_hashes(data_dir)
+    final_df = build_final_df(data_dir)
+    base_maps = {era:prepare_base_map(map_df) for era,map_df in load_base_maps(data_dir).items()}
+
+    _write_frame(data_dir,'final_df',final_df)
+    _write_frame(data_dir,'demographics',build_demographics(data_dir))
+    for era,map_df in base_maps.items():
+        _write_frame(data_dir,'map_' + era,map_df)
+
+    crs = {era:map_df.crs.to_string() for era,map_df in base_maps.items()}
+    manifest = {'version':CACHE_VERSION,'sources':hashes,'maps':crs,'tolerances':SIMPLIFY_TOLERANCES}
+    _replace_file(_cache_path(data_dir,'manifest.json'),lambda tmp: _write_json(tmp,manifest))
+    return final_df,base_maps
+
+def _write_json(path,data):
+    with open(path,'w') as f:
+        json.dump(data,f,indent=1)
+
+def _cache_is_fresh(manifest,hashes):
+    if manifest is None or manifest.get('version') != CACHE_VERSION:
+        return False
+    if manifest.get('tolerances') != SIMPLIFY_TOLERANCES:
+        return False
+    recorded = manifest.get('sources',{})
+    return set(recorded) == set(hashes) and all(recorded[k]['sha256'] == v['sha256'] for k,v in hashes.items())
+
+# Returns (final_df, base_maps) where final_df is the year x planning area table
+# and base_maps maps each era ('98', '08', '14', '19') to its boundary GeoDataFrame,
+# with one extra geometry column per simplification tier (see tier_column) and
+# its projected area in km2 (area_km2).
+def load_population_data(data_dir=DATA_DIR):
+    manifest = _read_manifest(data_dir)
+    hashes = source_hashes(data_dir,manifest and manifest.get('sources'))
+    if not _cache_is_fresh(manifest,hashes):
+        return build_cache(data_dir,hashes)
+    final_df = _read_frame(data_dir,'final_df')
+    base_maps = {era:_read_frame(data_dir,'map_' + era,crs) for era,crs in manifest['maps'].items()}
+    return final_df,base_maps
+
+# Content hash of each source the cache was built from, by file name: a key for
+# data derived from the cache and kept across reruns. Call after loading.
+def cache_sources(data_dir=DATA_DIR):
+    return {name:source['sha256'] for name,source in _read_manifest(data_dir)['sources'].items()}
+
+# The long table behind the demographic cube (see build_demographics), from the
+# same cache as load_population_data
+def load_demographics(data_dir=DATA_DIR):
+    manifest = _read_manifest(data_dir)
+    if not _cache_is_fresh(manifest,source_hashes(data_dir,manifest and manifest.get('sources'))):
+        build_cache(data_dir)
+    return _read_frame(data_dir,'demographics')
+
+# Planning areas of each base map with geom_idx, their row in the map, so the
+# joined table can reference geometry instead of carrying it
+def era_frame(map_df,era):
+    return pd.DataFrame({'planning_area':map_df['planning_area'].values,'planning_area_sf':map_df['planning_area_sf'].values,
+                         'geom_idx':np.arange(map_df.shape[0]),'era':era})
+
+# Era of each year according to MAP_ERAS, None before the first entry
+def year_eras(years,eras=MAP_ERAS):
+    first_years = np.array([first for first,era in eras])
+    names = np.array([era for first,era in eras] + [None],dtype=object)
+    return names[np.searchsorted(first_years,np.asarray(years),side='right') - 1]
+
+# Long (planning area, year) table of totals, each year joined to the base map it
+# is drawn on: every year gets its era from MAP_ERAS, then the whole table is
+# matched against the areas of all eras in one merge
+def join_eras(final_df,base_maps,eras=MAP_ERAS):
+    joined = final_df.assign(era=year_eras(final_df['year'].values,eras))
+    joined = joined.loc[joined['era'].notna()]
+    areas = pd.concat([era_frame(base_maps[era],era) for era in dict.fromkeys(era for first,era in eras)],ignore_index=True)
+    final_df_all = areas.merge(joined,left_on=['era','planning_area'],right_on=['era','planning area'])
+    return final_df_all.sort_values(['year','geom_idx'],ignore_index=True)
+
+if __name__ == '__main__':
+    start = time.perf_counter()
+    build_cache()
+    print('built cache in %.3fs' % (time.perf_counter() - start))
+    start = time.perf_counter()
+    load_population_data()
+    print('loaded cache in %.3fs' % (time.perf_counter() - start))
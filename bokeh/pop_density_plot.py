@@ -0,0 +1,541 @@
+import numpy as np
+from bokeh.plotting import figure
+from bokeh.models.widgets import Slider, Select
+from bokeh.models import ColumnDataSource, LinearColorMapper, ColorBar, FixedTicker, HoverTool, CustomJS, PanTool, WheelZoomTool, ResetTool
+from bokeh.palettes import brewer
+from bokeh.layouts import column, row
+
+from pop_density_data import tier_column
+from pop_geometry import SIMPLIFY_TOLERANCES, flat_coords, nested_coords, pick_tier
+from pop_cube import SEX_OPTIONS, ALL_AGES, BOTH_SEXES, age_options, age_weights, era_counts, selection_counts
+
+# Choropleth for the population density page.
+# Each boundary is shipped once: per map era, flat coordinate and ring buffers
+# for every simplification tier (see flat_coords) and one dense year x area
+# value matrix. Moving the slider only swaps the value columns and, when the
+# era changes, rebuilds the plot's xs/ys as views into that era's buffers.
+# Only columns the glyph or the hover tool reads are shipped, all as binary
+# arrays except the area names.
+# Areas are colored by density (residents per km2) in quantile bins.
+# Given the demographic cube (pop_cube.py), age group and sex Selects recolor
+# the map with the residents of the selection, computed from each era's
+# (year, area, age group, sex) counts in the browser.
+
+# planning_area, area_km2 and the flat_coords buffers of each tier for one base map
+def era_geometry(map_df):
+    return {'planning_area':map_df['planning_area'].values,'area_km2':np.asarray(map_df['area_km2'].values,dtype=np.float64),
+            'tiers':[flat_coords(map_df[tier_column(tier)]) for tier in range(len(SIMPLIFY_TOLERANCES))]}
+
+# Columns of every source of one era for the callbacks: the areas, per tier the
+# vertices and the ring table (their lengths differ, hence two sources), the
+# values, and with a demographic cube the era's flat counts. The value source
+# stores each (year, area) matrix row-major as one flat column, so a year's
+# values are the contiguous run starting at its offset (see year_offsets); with
+# a cube it also holds the page's totals and which cells have any counts.
+def era_data(model,era):
+    geometry, values = model['geometry'][era], model['values'][era]
+    data = {
+        'areas':{'planning_area':geometry['planning_area'],'area_km2':geometry['area_km2']},
+        'coords':[{'x':flat['x'],'y':flat['y']} for flat in geometry['tiers']],
+        'rings':[{column:flat[column] for column in ['ring_end','ring_row','ring_first']} for flat in geometry['tiers']],
+        'values':{column:values[column].ravel() for column in VALUE_COLUMNS},
+    }
+    if era in model['cube']:
+        counts, known = model['cube'][era]
+        data['values'].update(residents=model['residents'][era].ravel(),known=known.ravel().astype(np.int8))
+        data['cube'] = {'counts':counts.ravel()}
+    return data
+
+# era_data with the boundaries of only the given tiers, the others left empty
+def keep_tiers(data,tiers):
+    return dict(data,coords=[columns if tier in tiers else {} for tier,columns in enumerate(data['coords'])],
+                rings=[columns if tier in tiers else {} for tier,columns in enumerate(data['rings'])])
+
+# ColumnDataSources of era_data, empty for an era the page loads later (see LOAD_JS)
+def era_sources(data,empty=False):
+    def source(columns):
+        return ColumnDataSource({} if empty else columns)
+    return {name:[source(c) for c in columns] if isinstance(columns,list) else source(columns) for name,columns in data.items()}
+
+# Dense (year, area) matrix of totals from one era's rows of the joined table.
+# Areas without data for a year are NaN and drawn in the mapper's nan_color.
+def era_values(joined,n_areas):
+    years = np.sort(joined['year'].unique())
+    values = np.full((len(years),n_areas),np.nan)
+    values[np.searchsorted(years,joined['year'].values),joined['geom_idx'].values] = joined['total'].values
+    return years, values
+
+# Per-area columns that change with the year, in the order the slider copies them
+VALUE_COLUMNS = ['total','density','bin']
+
+# Number of color bins; each holds about the same number of (area, year) values
+DENSITY_BINS = 6
+
+# Bin edges at the quantiles of every density on the page, so the colors spread
+# over the data actually drawn whatever its range. Unpopulated areas (water
+# catchments, the airport, ...) are left out of the quantiles and fall in the
+# first bin; edges that coincide are merged.
+def density_edges(densities,n_bins=DENSITY_BINS):
+    densities = np.concatenate([d.ravel() for d in densities])
+    populated = densities[densities > 0]
+    if not len(populated):
+        return np.array([0.0,1.0])
+    edges = np.quantile(populated,np.linspace(0,1,n_bins + 1))
+    edges[0] = 0
+    return np.unique(edges)
+
+# Bin index of each density, -1 where there is no data (drawn as the low_color)
+def density_bins(density,edges):
+    bins = np.digitize(density,edges[1:-1]).astype(np.int8)
+    bins[np.isnan(density)] = -1
+    return bins
+
+# Residents per km2 for every year of an era at once, from the era's (year, area)
+# totals and the areas' projected km2 cached with the base map
+def era_density(values,area_km2):
+    return values / np.asarray(area_km2,dtype=np.float64)[np.newaxis,:]
+
+# Colors of n density bins, dark blue for the densest
+def bin_palette(n_bins):
+    return brewer['YlGnBu'][max(n_bins,3)][:n_bins][::-1]
+
+# Row offset of each year into its era's flat value columns
+def year_offsets(years,n_areas):
+    return {int(year):i * n_areas for i,year in enumerate(years)}
+
+# xs/ys of an era's areas at one tier for multi_polygons, built from the era's
+# flat buffers (see flat_coords); every ring is a subarray view, not a copy
+NESTED_JS = """
+        function nested(shapes, tier) {
+          const x = shapes.coords[tier].data['x'];
+          const y = shapes.coords[tier].data['y'];
+          const rings = shapes.rings[tier].data;
+          const n = shapes.areas.data['planning_area'].length;
+          const xs = Array.from({length: n}, () => []);
+          const ys = Array.from({length: n}, () => []);
+          let start = 0;
+          for (let r = 0; r < rings['ring_end'].length; r++) {
+            const a = rings['ring_row'][r], end = rings['ring_end'][r];
+            if (rings['ring_first'][r]) {
+              xs[a].push([]);
+              ys[a].push([]);
+            }
+            xs[a][xs[a].length - 1].push(x.subarray(start, end));
+            ys[a][ys[a].length - 1].push(y.subarray(start, end));
+            start = end;
+          }
+          return [xs, ys];
+        }
+"""
+
+# Constant time in the number of years: the year's offset comes from a prebuilt
+# index and its totals are a subarray view of the era's Float64Array, not a copy.
+# The boundaries are only rebuilt when the era changes.
+YEAR_JS = NESTED_JS + """
+        function show_year() {
+          const f = slider.value;
+          const era = year_era[f];
+          const k = year_offset[f];
+          const tier = lod.data['tier'][0];
+          const shapes = geometry[era];
+          const values = value_sources[era].data;
+          const n = shapes.areas.data['planning_area'].length;
+
+          let xs = source2.data['xs'], ys = source2.data['ys'];
+          if (era != lod.data['era'][0]) {
+            [xs, ys] = nested(shapes, tier);
+            lod.data['era'][0] = era;
+          }
+          const data = {
+            'planning_area': shapes.areas.data['planning_area'],
+            'xs': xs,
+            'ys': ys,
+            'year': new Int32Array(n).fill(f),
+          };
+          for (const column of value_columns){
+            const v = values[column];
+            data[column] = v.subarray ? v.subarray(k, k + n) : v.slice(k, k + n);
+          }
+          source2.data = data;
+        }
+"""
+
+# Fills an era's empty sources from its data file (see pop_export.py) the first
+# time it is needed. The start year's era is on the page at its first tier, and
+# its file holds only the other tiers. load_era() is null once the era's data,
+# and if given that tier's boundaries, are on the page, else the promise of
+# them; each file is fetched once.
+LOAD_JS = """
+        const TYPED = {float64: Float64Array, float32: Float32Array, int32: Int32Array, int8: Int8Array, uint8: Uint8Array};
+        function unpack(buffer) {
+          const n = new DataView(buffer).getUint32(0, true);
+          const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, n)));
+          const column = (spec) => spec.dtype ? new TYPED[spec.dtype](buffer, 4 + n + spec.offset, spec.length) : spec;
+          const columns = (spec) => Array.isArray(spec) ? spec.map(columns) : Object.fromEntries(Object.entries(spec).map(([k, v]) => [k, column(v)]));
+          return Object.fromEntries(Object.entries(header).map(([name, spec]) => [name, columns(spec)]));
+        }
+        async function fetch_era(url) {
+          const buffer = await (await fetch(url)).arrayBuffer();
+          const magic = new Uint8Array(buffer, 0, 2);
+          // the server may have sent it with Content-Encoding: gzip, already inflated
+          if (magic[0] != 0x1f || magic[1] != 0x8b) return buffer;
+          return new Response(new Blob([buffer]).stream().pipeThrough(new DecompressionStream('gzip'))).arrayBuffer();
+        }
+        function load_era(era, tier) {
+          const shapes = geometry[era];
+          if (!(era in era_files) || (shapes.areas.data['planning_area'] && (tier === undefined || shapes.coords[tier].data['x']))) return null;
+          const pending = lod.pending || (lod.pending = {});
+          if (!pending[era]) {
+            pending[era] = fetch_era(era_files[era]).then((buffer) => {
+              const data = unpack(buffer);
+              data.coords.forEach((columns, tier) => { if (columns['x']) shapes.coords[tier].data = columns; });
+              data.rings.forEach((columns, tier) => { if (columns['ring_end']) shapes.rings[tier].data = columns; });
+              if (data.values) value_sources[era].data = data.values;
+              if (data.cube) cubes[era].data = data.cube;
+              if (data.areas) shapes.areas.data = data.areas;
+            });
+          }
+          return pending[era];
+        }
+"""
+
+# A year whose era is still loading is shown when it arrives, unless the slider
+# has moved on to another era that is
+SLIDER_JS = YEAR_JS + LOAD_JS + """
+        const loading = load_era(year_era[slider.value], lod.data['tier'][0]);
+        if (loading) {
+          loading.then(() => { if (!load_era(year_era[slider.value], lod.data['tier'][0])) show_year(); });
+        } else {
+          show_year();
+        }
+"""
+
+# density_edges, density_bins and bin_labels in the browser, giving the same
+# numbers: the quantiles interpolate as np.quantile's default 'linear' method
+# does and the labels round half to even as round() does
+BINS_JS = """
+        function quantile(sorted, q) {
+          const index = q * (sorted.length - 1);
+          const below = Math.floor(index), above = Math.min(below + 1, sorted.length - 1);
+          const t = index - below, a = sorted[below], d = sorted[above] - a;
+          return t >= 0.5 ? sorted[above] - d * (1 - t) : a + d * t;
+        }
+        function density_edges(densities, n_bins) {
+          const populated = [];
+          for (const density of densities)
+            for (const d of density)
+              if (d > 0) populated.push(d);
+          if (!populated.length) return [0, 1];
+          const sorted = Float64Array.from(populated).sort();
+          const edges = [0];
+          for (let i = 1; i <= n_bins; i++)
+            edges.push(quantile(sorted, i == n_bins ? 1 : i * (1 / n_bins)));
+          return Array.from(new Set(edges)).sort((a, b) => a - b);
+        }
+        function density_bins(density, edges) {
+          const bins = new Int8Array(density.length);
+          for (let i = 0; i < density.length; i++) {
+            if (isNaN(density[i])) {
+              bins[i] = -1;
+              continue;
+            }
+            let b = 0;
+            while (b < edges.length - 2 && edges[b + 1] <= density[i]) b++;
+            bins[i] = b;
+          }
+          return bins;
+        }
+        function label(x) {
+          const r = Math.round(x);
+          const even = r - x == 0.5 && r % 2 ? r - 1 : r;
+          return even.toLocaleString('en-US');
+        }
+        function bin_labels(edges) {
+          const labels = {};
+          for (let i = 0; i < edges.length - 1; i++)
+            labels[String(i)] = label(edges[i]) + ' - < ' + label(edges[i + 1]);
+          labels[String(edges.length - 2)] = '>= ' + label(edges[edges.length - 2]);
+          return labels;
+        }
+"""
+
+# Recolors the map for the selected age group and sex: each era's totals are
+# weighted sums over the (year, area, age group, sex) counts in `cubes`, as
+# selection_counts computes them, then the bins and color bar are rebuilt and
+# the slider's year is shown again
+DRILL_JS = YEAR_JS + LOAD_JS + BINS_JS + """
+        function drill() {
+          const all = age_select.value == all_ages && sex_select.value == both_sexes;
+          const ages = age_weights[age_select.value];
+          const [sexes, unknown] = sex_options[sex_select.value];
+          const G = ages.length, X = sexes.length;
+          const densities = [];
+          for (const era in value_sources) {
+            const values = value_sources[era].data;
+            const area_km2 = geometry[era].areas.data['area_km2'];
+            const counts = cubes[era].data['counts'];
+            const known = values['known'];
+            const total = new Float64Array(known.length);
+            for (let i = 0; i < known.length; i++) {
+              if (all) {
+                total[i] = values['residents'][i];
+                continue;
+              }
+              let sum = 0, missing = 0;
+              for (let g = 0; g < G; g++) {
+                if (!ages[g]) continue;
+                const k = (i * G + g) * X;
+                for (let x = 0; x < X; x++) {
+                  sum += sexes[x] * counts[k + x];
+                  missing += unknown[x] * counts[k + x];
+                }
+              }
+              total[i] = known[i] && !missing ? sum : NaN;
+            }
+            const density = total.map((t, i) => t / area_km2[i % area_km2.length]);
+            values['total'] = total;
+            values['density'] = density;
+            densities.push(density);
+          }
+          const edges = density_edges(densities, n_bins);
+          for (const era in value_sources)
+            value_sources[era].data['bin'] = density_bins(value_sources[era].data['density'], edges);
+
+          const n = edges.length - 1;
+          color_mapper.palette = palettes[n];
+          color_mapper.high = n - 0.5;
+          color_bar.ticker.ticks = Array.from({length: n}, (_, i) => i);
+          color_bar.major_label_overrides = bin_labels(edges);
+          show_year();
+        }
+
+        // the bins span every era, so all of them are loaded first, and the
+        // boundaries of the year shown
+        const shown = year_era[slider.value];
+        const loading = Object.keys(value_sources).map((era) => load_era(era, era == shown ? lod.data['tier'][0] : undefined)).filter((promise) => promise);
+        if (loading.length) {
+          Promise.all(loading).then(drill);
+        } else {
+          drill();
+        }
+"""
+
+# Swap in the coarsest simplification tier that is still finer than a pixel. A
+# tier still loading is swapped in when it arrives, if the zoom still wants it.
+ZOOM_JS = NESTED_JS + LOAD_JS + """
+        function wanted_tier() {
+          const pixel = (x_range.end - x_range.start) / (plot.inner_width || plot.plot_width);
+          var tier = 0;
+          for (var t = 0; t < tolerances.length; t++){
+            if (tolerances[t] <= pixel){
+              tier = t;
+            }
+          }
+          return tier;
+        }
+        function show_tier(tier) {
+          if (tier == lod.data['tier'][0]){
+            return;
+          }
+          lod.data['tier'][0] = tier;
+
+          const [xs, ys] = nested(geometry[lod.data['era'][0]], tier);
+          source2.data['xs'] = xs;
+          source2.data['ys'] = ys;
+          source2.change.emit();
+        }
+
+        const tier = wanted_tier();
+        const loading = tier == lod.data['tier'][0] ? null : load_era(lod.data['era'][0], tier);
+        if (loading) {
+          loading.then(() => { if (wanted_tier() == tier) show_tier(tier); });
+        } else {
+          show_tier(tier);
+        }
+"""
+
+# Everything the page needs, computed once from the joined table. joined is the
+# long (planning area, year) table with the era each year is drawn on and
+# geom_idx, the row of that area in the era's base map.
+# model['residents'][era] is the era's (year, area) totals and
+# model['values'][era] maps each of VALUE_COLUMNS to its (year, area) matrix for
+# the selection shown (see drill_down). With a demographic cube,
+# model['cube'][era] holds the era's counts and model['age_weights'] the
+# weights of every age selection.
+def population_model(joined,base_maps,cube=None):
+    model = {'geometry':{},'residents':{},'cube':{},'era_years':{},'year_era':{},'year_offset':{}}
+    for era,rows in joined.groupby('era'):
+        n_areas = len(base_maps[era])
+        model['geometry'][era] = era_geometry(base_maps[era])
+        years, model['residents'][era] = era_values(rows,n_areas)
+        model['era_years'][era] = years
+        model['year_era'].update({int(year):era for year in years})
+        model['year_offset'].update(year_offsets(years,n_areas))
+        if cube is not None:
+            model['cube'][era] = era_counts(cube,base_maps[era]['planning_area'].values,years)
+    if cube is not None:
+        model['age_weights'] = {option:age_weights(cube,option) for option in age_options(cube)}
+    return set_values(model,model['residents'])
+
+# model['values'] and the bin edges from each era's (year, area) totals
+def set_values(model,totals):
+    model['values'] = {era:{'total':totals[era],'density':era_density(totals[era],model['geometry'][era]['area_km2'])} for era in totals}
+    model['density_edges'] = density_edges([values['density'] for values in model['values'].values()])
+    for values in model['values'].values():
+        values['bin'] = density_bins(values['density'],model['density_edges'])
+    return model
+
+# Shows the residents of an age group and sex selection, summed from the cube's
+# counts; all ages and both sexes are the page's own totals
+def drill_down(model,age=ALL_AGES,sex=BOTH_SEXES):
+    if age == ALL_AGES and sex == BOTH_SEXES:
+        return set_values(model,model['residents'])
+    sexes, unknown = SEX_OPTIONS[sex]
+    return set_values(model,{era:selection_counts(counts,known,model['age_weights'][age],sexes,unknown)
+                             for era,(counts,known) in model['cube'].items()})
+
+# Year the map opens on: start_year, or the nearest of `years` when the data does
+# not have it (the later one on a tie); the latest year when not given
+def pick_start_year(years,start_year=None):
+    if start_year is None:
+        return max(years)
+    return min(years,key=lambda year: (abs(year - start_year),-year))
+
+# First and last of `years` for the page titles, e.g. '2000 - 2019'
+def year_span(years):
+    return '%d - %d' % (min(years),max(years))
+
+# Coarsest tier that is still finer than a pixel at an era's full extent
+def start_tier(base_maps,era,plot_width):
+    minx, miny, maxx, maxy = base_maps[era].total_bounds
+    return pick_tier(maxx - minx,plot_width)
+
+# One year's row of a value column, e.g. year_values(model,2019,'density'); a
+# view into the model, so copy it before handing it to a source
+def year_values(model,year,column='total'):
+    values = model['values'][model['year_era'][year]][column]
+    k = model['year_offset'][year]
+    return values.ravel()[k:k + values.shape[1]]
+
+# Columns of the plotted source for one year at one simplification tier
+def year_data(model,year,tier):
+    geometry = model['geometry'][model['year_era'][year]]
+    n_areas = len(geometry['planning_area'])
+    xs, ys = nested_coords(geometry['tiers'][tier],n_areas)
+    return {
+        'planning_area':geometry['planning_area'],
+        'xs':xs,
+        'ys':ys,
+        'year':np.full(n_areas,year,dtype=np.int32),
+        # copies: the server app patches the source in place
+        **{column:year_values(model,year,column).copy() for column in VALUE_COLUMNS},
+    }
+
+# Color bar label of each density bin, e.g. '1,200 - < 4,500'
+def bin_labels(edges):
+    labels = {str(i):'%s - < %s' % (format(int(round(lo)),','),format(int(round(hi)),',')) for i,(lo,hi) in enumerate(zip(edges[:-1],edges[1:]))}
+    labels[str(len(edges) - 2)] = '>= ' + format(int(round(edges[-2])),',')
+    return labels
+
+# The choropleth figure drawing `filtered`, plus the year slider
+def population_figure(filtered,years,start_year,edges,plot_width=700):
+    #Define a sequential multi-hue color palette, one color per density bin, dark blue highest.
+    palette = bin_palette(len(edges) - 1)
+
+    #Map each bin index to one color; bin -1 (no data) gets the low_color.
+    color_mapper = LinearColorMapper(palette = palette, low = -0.5, high = len(palette) - 0.5, low_color = '#d9d9d9')
+
+    #Label the color bar with the density range of each bin, ticks at the bin centres.
+    tick_labels = bin_labels(edges)
+
+    #Add hover tool
+    hover = HoverTool(tooltips = [ ('Region','@planning_area'),('Year','@year'),('Population Count', '@total'),('Residents per km²', '@density{0,0}')])
+
+    #Create color bar.
+    color_bar = ColorBar(color_mapper=color_mapper, label_standoff=6,width = 500, height = 20, ticker = FixedTicker(ticks = list(range(len(palette)))),
+                         border_line_color=None,location = (0,0), orientation = 'horizontal', major_label_overrides = tick_labels, title = 'Residents per km²')
+    #Create figure object.
+    wheel_zoom = WheelZoomTool()
+    p = figure(plot_height = 500 , plot_width = plot_width, toolbar_location = 'right',tools = [hover,PanTool(),wheel_zoom,ResetTool()])
+    p.toolbar.active_scroll = wheel_zoom
+    p.xgrid.grid_line_color = None
+    p.ygrid.grid_line_color = None
+    p.xaxis.visible = False
+    p.yaxis.visible = False
+
+    #Add patch renderer to figure.
+    p.multi_polygons(xs='xs', ys='ys', line_color='black',fill_color={'field' :'bin', 'transform' : color_mapper},fill_alpha=1, line_width = 0.25,source=filtered)
+
+    #Specify layout
+    p.add_layout(color_bar, 'below')
+
+    slider = Slider(title = 'Year',start = min(years), end = max(years), step = 1, value = start_year)
+    return p, slider
+
+# Points a figure's color bar and mapper at new bin edges
+def color_scale(p,edges):
+    color_bar = p.select_one({'type':ColorBar})
+    palette = bin_palette(len(edges) - 1)
+    color_bar.color_mapper.update(palette=palette,high=len(palette) - 0.5)
+    color_bar.update(ticker=FixedTicker(ticks=list(range(len(palette)))),major_label_overrides=bin_labels(edges))
+
+# Age group and sex Selects over every option of the model's cube
+def drill_selects(model):
+    return (Select(title='Age group',value=ALL_AGES,options=list(model['age_weights'])),
+            Select(title='Sex',value=BOTH_SEXES,options=list(SEX_OPTIONS)))
+
+# Standalone page: every era and tier is embedded and the slider and zoom are
+# handled in the browser by SLIDER_JS and ZOOM_JS. With a demographic cube,
+# each era's counts are embedded too and the Selects are handled by DRILL_JS.
+# era_files maps eras to the URL of their data file; those are left out of the
+# page and loaded when needed, except for the start year's era, which is on the
+# page at its first tier and whose file holds its other tiers. model is
+# population_model's, if already built. start_year defaults to the latest year
+# in the data (see pick_start_year).
+def population_map(joined,base_maps,start_year=None,plot_width=700,cube=None,era_files=None,model=None):
+    if model is None:
+        model = population_model(joined,base_maps,cube)
+    start_year = pick_start_year(model['year_era'],start_year)
+    era = model['year_era'][start_year]
+    tier = start_tier(base_maps,era,plot_width)
+    era_files = era_files or {}
+
+    filtered = ColumnDataSource(year_data(model,start_year,tier))
+    sources = {}
+    for name in model['geometry']:
+        data = era_data(model,name)
+        if name == era and name in era_files:
+            sources[name] = era_sources(keep_tiers(data,{tier}))
+        else:
+            sources[name] = era_sources(data,name in era_files)
+    geometry_sources = {name:{key:sources[name][key] for key in ['areas','coords','rings']} for name in sources}
+    value_sources = {name:sources[name]['values'] for name in sources}
+    cube_sources = {name:sources[name]['cube'] for name in sources if 'cube' in sources[name]}
+    # The tier and era of the boundaries on the plot
+    lod = ColumnDataSource({'tier':[tier],'era':[era]})
+
+    p, slider = population_figure(filtered,model['year_era'],start_year,model['density_edges'],plot_width)
+
+    year_args = dict(source2=filtered,geometry=geometry_sources,value_sources=value_sources,cubes=cube_sources,era_files=era_files,
+                     value_columns=VALUE_COLUMNS,year_era=model['year_era'],year_offset=model['year_offset'],lod=lod,slider=slider)
+    callback = CustomJS(args=year_args, code=SLIDER_JS)
+    slider.js_on_change('value', callback)
+
+    zoom_callback = CustomJS(args=dict(source2=filtered,geometry=geometry_sources,value_sources=value_sources,cubes=cube_sources,era_files=era_files,
+                                       lod=lod,plot=p,x_range=p.x_range,tolerances=SIMPLIFY_TOLERANCES), code=ZOOM_JS)
+    p.x_range.js_on_change('start', zoom_callback)
+    p.x_range.js_on_change('end', zoom_callback)
+
+    if cube is None:
+        # Make a column layout of widgetbox(slider) and plot
+        return column(slider,p)
+
+    age_select, sex_select = drill_selects(model)
+    color_bar = p.select_one({'type':ColorBar})
+    drill_callback = CustomJS(args=dict(year_args,age_select=age_select,sex_select=sex_select,all_ages=ALL_AGES,both_sexes=BOTH_SEXES,
+                                        age_weights={option:weights.tolist() for option,weights in model['age_weights'].items()},sex_options=SEX_OPTIONS,
+                                        n_bins=DENSITY_BINS,palettes={n:bin_palette(n) for n in range(1,DENSITY_BINS + 1)},
+                                        color_mapper=color_bar.color_mapper,color_bar=color_bar), code=DRILL_JS)
+    age_select.js_on_change('value', drill_callback)
+    sex_select.js_on_change('value', drill_callback)
+    return column(row(age_select,sex_select),slider,p)
@@ -0,0 +1,77 @@
+import numpy as np
+from bokeh.io import curdoc
+from bokeh.models import ColumnDataSource
+from bokeh.layouts import column, row
+
+from pop_density_data import load_population_data, load_demographics, join_eras
+from pop_density_plot import population_model, population_figure, drill_down, drill_selects, color_scale, VALUE_COLUMNS, year_data, year_values, start_tier, pick_start_year, year_span
+from pop_geometry import nested_coords, pick_tier
+from pop_cube import demographic_cube
+
+# Population density map as a Bokeh server app:
+#     bokeh serve bokeh/pop_density_server.py
+# The data stays in Python. The page only holds the current era's boundaries at
+# the current simplification tier, and a slider tick sends a patch of the values
+# that changed instead of every year being embedded up front. The age group and
+# sex Selects are summed from the demographic cube here and only send the
+# current year's values and the new color bar.
+
+plot_width = 700
+
+final_df, base_maps = load_population_data()
+model = population_model(join_eras(final_df,base_maps),base_maps,demographic_cube(load_demographics()))
+# Opens on the latest year in the data
+start_year = pick_start_year(model['year_era'])
+
+state = {'year':start_year,'tier':start_tier(base_maps,model['year_era'][start_year],plot_width)}
+filtered = ColumnDataSource(year_data(model,state['year'],state['tier']))
+p, slider = population_figure(filtered,model['year_era'],start_year,model['density_edges'],plot_width)
+
+# Positions whose value differs between two years (NaN counts as equal to NaN)
+def changed_positions(old,new):
+    same = (old == new) | (np.isnan(old) & np.isnan(new))
+    return np.flatnonzero(~same)
+
+def update_year(attr,old,new):
+    if model['year_era'][new] != model['year_era'][state['year']]:
+        # A different base map: the boundaries change too, so replace the data
+        filtered.data = year_data(model,new,state['tier'])
+    else:
+        n_areas = len(filtered.data['planning_area'])
+        # 'year' is only read by the hover tooltip
+        patches = {'year':[(slice(0,n_areas),np.full(n_areas,new,dtype=np.int32))]}
+        for name in VALUE_COLUMNS:
+            old_values = year_values(model,state['year'],name).astype(np.float64)
+            new_values = year_values(model,new,name)
+            changed = changed_positions(old_values,new_values.astype(np.float64))
+            if len(changed):
+                patches[name] = [(int(i),new_values[i].item()) for i in changed]
+        filtered.patch(patches)
+    state['year'] = new
+
+# Swap in the coarsest simplification tier that is still finer than a pixel
+def update_tier(attr,old,new):
+    if p.x_range.start is None or p.x_range.end is None:
+        return
+    tier = pick_tier(p.x_range.end - p.x_range.start,p.inner_width or plot_width)
+    if tier == state['tier']:
+        return
+    state['tier'] = tier
+    geometry = model['geometry'][model['year_era'][state['year']]]
+    xs, ys = nested_coords(geometry['tiers'][tier],len(geometry['planning_area']))
+    filtered.data.update({'xs':xs,'ys':ys})
+
+def update_selection(attr,old,new):
+    drill_down(model,age_select.value,sex_select.value)
+    filtered.data.update({name:year_values(model,state['year'],name).copy() for name in VALUE_COLUMNS})
+    color_scale(p,model['density_edges'])
+
+age_select, sex_select = drill_selects(model)
+age_select.on_change('value',update_selection)
+sex_select.on_change('value',update_selection)
+slider.on_change('value',update_year)
+p.x_range.on_change('start',update_tier)
+p.x_range.on_change('end',update_tier)
+
+curdoc().add_root(column(row(age_select,sex_select),slider,p))
+curdoc().title = 'Singapore Population Density ' + year_span(model['year_era'])
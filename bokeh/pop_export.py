@@ -0,0 +1,94 @@
+import os
+import sys
+import json
+import gzip
+import time
+import struct
+import hashlib
+import numpy as np
+from bokeh.embed import file_html
+from bokeh.resources import CDN
+
+from pop_density_data import load_population_data, load_demographics, join_eras
+from pop_density_plot import population_model, population_map, era_data, keep_tiers, start_tier, pick_start_year, year_span
+from pop_cube import demographic_cube
+
+# Static build of the population density page, for any static file server:
+#     python bokeh/pop_export.py [out_dir] [start_year]
+# start_year defaults to the latest year in the data.
+# out_dir/index.html is the map with only the start year's era embedded, at the
+# simplification tier of the first paint; every other era's boundaries, values
+# and demographic counts, and the start era's other tiers, are a gzipped file in
+# out_dir/data/ named after its content hash, so a server can cache them for
+# good. The page fetches an era's file the first time the slider reaches it or
+# a zoom needs one of its tiers (see LOAD_JS), and every era's before the first
+# age group or sex drill-down.
+# Files of earlier builds are left in place for pages still cached.
+
+OUT_DIR = 'population-density-site'
+FILES_DIR = 'data'
+# Filled in with the years of the data (year_span)
+TITLE = 'Singapore Population Density %s'
+
+# Byte alignment of every column in a data file, enough for a Float64Array view
+ALIGNMENT = 8
+
+# era_data as one buffer: a little-endian uint32 header length, the JSON header
+# (era_data with each numeric column replaced by its dtype, offset and length;
+# string columns stay lists), then the columns' raw bytes. The header is padded
+# so the columns start, and stay, aligned and the page can view them in place.
+def pack_era(data):
+    buffers = []
+    size = 0
+    def spec(values):
+        nonlocal size
+        values = np.asarray(values)
+        if values.dtype == object:
+            return values.tolist()
+        raw = values.astype(values.dtype.newbyteorder('<')).tobytes()
+        buffers.append(raw + bytes(-len(raw) % ALIGNMENT))
+        size, offset = size + len(buffers[-1]), size
+        return {'dtype':values.dtype.name,'offset':offset,'length':len(values)}
+    def specs(columns):
+        return [specs(c) for c in columns] if isinstance(columns,list) else {name:spec(values) for name,values in columns.items()}
+    header = json.dumps({name:specs(columns) for name,columns in data.items()},separators=(',',':')).encode()
+    header += b' ' * (-(4 + len(header)) % ALIGNMENT)
+    return struct.pack('<I',len(header)) + header + b''.join(buffers)
+
+# Writes one era's data file; returns its URL relative to index.html
+def write_era_file(out_dir,era,data):
+    # mtime=0 so the same data always gives the same bytes and name
+    content = gzip.compress(pack_era(data),mtime=0)
+    name = '%s.%s.bin.gz' % (era,hashlib.sha256(content).hexdigest()[:16])
+    with open(os.path.join(out_dir,FILES_DIR,name),'wb') as f:
+        f.write(content)
+    return FILES_DIR + '/' + name
+
+# Writes index.html and the data file of every era, the start year's with only
+# the tiers the page leaves out; returns the page's layout and the URL of each
+# era's file
+def export_site(joined,base_maps,cube=None,out_dir=OUT_DIR,start_year=None,plot_width=700):
+    os.makedirs(os.path.join(out_dir,FILES_DIR),exist_ok=True)
+    model = population_model(joined,base_maps,cube)
+    start_year = pick_start_year(model['year_era'],start_year)
+    start_era = model['year_era'][start_year]
+    era_files = {era:write_era_file(out_dir,era,era_data(model,era)) for era in model['geometry'] if era != start_era}
+    data = era_data(model,start_era)
+    other_tiers = set(range(len(data['coords']))) - {start_tier(base_maps,start_era,plot_width)}
+    if other_tiers:
+        era_files[start_era] = write_era_file(out_dir,start_era + '-tiers',keep_tiers({'coords':data['coords'],'rings':data['rings']},other_tiers))
+    layout = population_map(joined,base_maps,start_year,plot_width,cube=cube,era_files=era_files,model=model)
+    with open(os.path.join(out_dir,'index.html'),'w',encoding='utf-8') as f:
+        f.write(file_html(layout,CDN,TITLE % year_span(model['year_era'])))
+    return layout, era_files
+
+if __name__ == '__main__':
+    out_dir = sys.argv[1] if len(sys.argv) > 1 else OUT_DIR
+    start_year = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    start = time.perf_counter()
+    final_df, base_maps = load_population_data()
+    cube = demographic_cube(load_demographics())
+    layout, era_files = export_site(join_eras(final_df,base_maps),base_maps,cube,out_dir,start_year)
+    for path in ['index.html'] + list(era_files.values()):
+        print('%-40s %10d bytes' % (path,os.path.getsize(os.path.join(out_dir,path))))
+    print('exported in %.3fs' % (time.perf_counter() - start))
@@ -0,0 +1,68 @@
+import numpy as np
+import shapely
+
+# Geometry helpers for the population density choropleth.
+
+# Every ring of a GeoDataFrame/GeoSeries of (Multi)Polygons as flat buffers:
+# x and y of all vertices (float64) and, per ring, where its vertices end
+# (int32), its row (int32) and whether it starts a new polygon (int8, 0 for
+# the holes following it). Bokeh sends each of these as one binary array,
+# where nested lists cost an encoded array per ring.
+# All coordinates come out of a single get_coordinates call, so there is no
+# per-vertex Python work. Non-polygonal parts are left out.
+def flat_coords(geometry):
+    geoms = np.asarray(getattr(geometry,'geometry',geometry))
+    parts, part_owner = shapely.get_parts(geoms,return_index=True)
+    keep = shapely.get_type_id(parts) == shapely.GeometryType.POLYGON
+    parts, part_owner = parts[keep], part_owner[keep]
+    rings, ring_part = shapely.get_rings(parts,return_index=True)
+
+    coords = shapely.get_coordinates(rings)
+    return {
+        'x':np.ascontiguousarray(coords[:,0]),
+        'y':np.ascontiguousarray(coords[:,1]),
+        'ring_end':np.cumsum(shapely.get_num_coordinates(rings)).astype(np.int32),
+        'ring_row':part_owner[ring_part].astype(np.int32),
+        'ring_first':np.r_[True,ring_part[1:] != ring_part[:-1]].astype(np.int8) if len(ring_part) else np.zeros(0,dtype=np.int8),
+    }
+
+# The nested xs/ys lists that Bokeh's multi_polygons expects, from flat_coords
+# buffers: one entry per row, holding a list of polygons, each a list of rings
+# (exterior first, then holes) as float64 arrays. Rows without polygons get an
+# empty list.
+def nested_coords(flat,n_rows):
+    starts = np.r_[0,flat['ring_end'][:-1]]
+    xs = [[] for i in range(n_rows)]
+    ys = [[] for i in range(n_rows)]
+    for start,end,row,first in zip(starts,flat['ring_end'],flat['ring_row'],flat['ring_first']):
+        if first:
+            xs[row].append([])
+            ys[row].append([])
+        xs[row][-1].append(flat['x'][start:end])
+        ys[row][-1].append(flat['y'][start:end])
+    return xs, ys
+
+def multipolygon_coords(geometry):
+    return nested_coords(flat_coords(geometry),len(getattr(geometry,'geometry',geometry)))
+
+# Level-of-detail tiers, as simplification tolerances in map units (degrees).
+# Tier 0 is the full-resolution boundary. The plot shows the coarsest tier whose
+# tolerance is still under one screen pixel, see pick_tier().
+SIMPLIFY_TOLERANCES = [0.0,0.00005,0.0002,0.0005]
+
+# Simplified copies of a set of boundaries, one array of geometries per tolerance.
+# The planning areas form a coverage, so they are simplified together with
+# coverage_simplify (Visvalingam-Whyatt on shared edges, shapely 2.1 / GEOS 3.12
+# and later), which moves each shared border once and leaves no gaps or overlaps
+# between neighbours.
+def simplify_tiers(geometry,tolerances=SIMPLIFY_TOLERANCES):
+    geoms = shapely.make_valid(np.asarray(getattr(geometry,'geometry',geometry)))
+    return [geoms if tolerance == 0 else shapely.coverage_simplify(geoms,tolerance) for tolerance in tolerances]
+
+def pick_tier(span,plot_width,tolerances=SIMPLIFY_TOLERANCES):
+    pixel = span / plot_width
+    tier = 0
+    for i,tolerance in enumerate(tolerances):
+        if tolerance <= pixel:
+            tier = i
+    return tier
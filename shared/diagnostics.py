@@ -0,0 +1,208 @@
+import os
+import sys
+import json
+import time
+import weakref
+import logging
+import threading
+import tracemalloc
+import numpy as np
+import pandas as pd
+from bokeh.model import Model
+from bokeh.embed import json_item
+
+# Stage timings for the Streamlit pages. Each stage of a rerun is wrapped in
+#     with diagnostics.stage('parse hourly') as stage:
+#         df = stage.output(parse_hourly(stage.input(df)))
+# which records its wall time, the rows and bytes it took in and gave out, and,
+# with memory tracing on, its peak allocations. At the end of the rerun
+# diagnostics.report(st) logs one JSON line and shows the table in a collapsed
+# panel.
+# Diagnostics are off unless the DASHBOARD_DIAGNOSTICS environment variable is
+# '1' (timings) or 'memory' (also tracemalloc, which slows every allocation in
+# the process down), or the page's ?diagnostics=1 query parameter asks for
+# timings. When off, stage() hands back one shared no-op object and nothing is
+# measured.
+# Both pages import this module from shared/, which they put on sys.path.
+
+SETTING_VARIABLE = 'DASHBOARD_DIAGNOSTICS'
+
+log = logging.getLogger('diagnostics')
+if not log.handlers:
+    log.addHandler(logging.StreamHandler(sys.stderr))
+    log.setLevel(logging.INFO)
+    log.propagate = False
+
+# '', '1' or 'memory': the environment variable, or '1' when it is unset and
+# the query parameter is '1'. A visitor can not turn memory tracing on.
+def diagnostics_setting(st):
+    setting = os.environ.get(SETTING_VARIABLE,'')
+    if not setting and st.experimental_get_query_params().get('diagnostics',[''])[0] == '1':
+        return '1'
+    return setting
+
+def row_count(value):
+    if isinstance(value,(pd.DataFrame,pd.Series,np.ndarray)):
+        return len(value)
+    if isinstance(value,dict):
+        values = list(value.values())
+        # a dict of arrays is one table of columns
+        if values and all(isinstance(v,np.ndarray) for v in values):
+            return len(values[0])
+        return sum(row_count(v) for v in values)
+    if isinstance(value,(list,tuple)):
+        return sum(row_count(v) for v in value)
+    return 0
+
+# Size in memory of frames and arrays (strings included), summed over dicts,
+# lists and tuples. A Bokeh model counts as its serialized document, so
+# measuring one serializes it a second time (see Stage.output).
+def byte_count(value):
+    if isinstance(value,pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value,pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value,np.ndarray):
+        return value.nbytes
+    if isinstance(value,(str,bytes)):
+        return len(value)
+    if isinstance(value,dict):
+        return sum(byte_count(v) for v in value.values())
+    if isinstance(value,(list,tuple)):
+        return sum(byte_count(v) for v in value)
+    if isinstance(value,Model):
+        return len(json.dumps(json_item(value)))
+    return 0
+
+class Stage:
+    def __init__(self,name,memory):
+        self.name = name
+        self.memory = memory
+        self.rows = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = 0.0
+        self.peak = None
+        # time spent counting rows and bytes, left out of the stage's time
+        self._counting = 0.0
+        self._documents = []
+
+    def __enter__(self):
+        if self.memory:
+            tracemalloc.reset_peak()
+            self._base = tracemalloc.get_traced_memory()[0]
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self,*exc):
+        self.seconds = time.perf_counter() - self._start - self._counting
+        if self.memory:
+            self.peak = tracemalloc.get_traced_memory()[1] - self._base
+        return False
+
+    # Counts what the stage reads; returns value
+    def input(self,value):
+        start = time.perf_counter()
+        self.bytes_in += byte_count(value)
+        self._counting += time.perf_counter() - start
+        return value
+
+    # Counts what the stage produces, rows included unless given; returns value.
+    # Bokeh models are only serialized for their size in record(), after the
+    # stage, so that it does not add to the stage's peak.
+    def output(self,value,rows=None):
+        start = time.perf_counter()
+        if isinstance(value,Model):
+            self._documents.append(value)
+        else:
+            self.bytes_out += byte_count(value)
+        self.rows = (self.rows or 0) + (row_count(value) if rows is None else rows)
+        self._counting += time.perf_counter() - start
+        return value
+
+    def record(self):
+        self.bytes_out += byte_count(self._documents)
+        self._documents = []
+        return {'stage':self.name,'ms':round(self.seconds * 1000,3),'rows':self.rows,
+                'bytes_in':self.bytes_in,'bytes_out':self.bytes_out,'peak_bytes':self.peak}
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exc):
+        return False
+
+    def input(self,value):
+        return value
+
+    def output(self,value,rows=None):
+        return value
+
+NULL_STAGE = _NullStage()
+
+# tracemalloc is process-wide and reruns of both pages can overlap, so it is
+# started by the first Diagnostics that traces memory and stopped when the
+# last one lets go of it
+_tracing_lock = threading.Lock()
+_tracing_count = 0
+
+def _start_tracing():
+    global _tracing_count
+    with _tracing_lock:
+        if _tracing_count == 0:
+            tracemalloc.start()
+        _tracing_count += 1
+
+def _stop_tracing():
+    global _tracing_count
+    with _tracing_lock:
+        _tracing_count -= 1
+        if _tracing_count == 0:
+            tracemalloc.stop()
+
+class Diagnostics:
+    def __init__(self,page,setting=''):
+        self.page = page
+        self.enabled = setting in ('1','memory')
+        self.memory = setting == 'memory'
+        self.stages = []
+        # lets go of tracing at report(), or once the rerun's globals are
+        # dropped if it ended early and never reported
+        self._tracing = None
+        if self.memory:
+            _start_tracing()
+            self._tracing = weakref.finalize(self,_stop_tracing)
+        self._start = time.perf_counter()
+
+    def stage(self,name):
+        if not self.enabled:
+            return NULL_STAGE
+        stage = Stage(name,self.memory)
+        self.stages.append(stage)
+        return stage
+
+    # Decorator form of stage(): times each call and counts what it returns
+    def timed(self,name):
+        def decorate(fn):
+            def wrapper(*args,**kwargs):
+                with self.stage(name) as stage:
+                    return stage.output(fn(*args,**kwargs))
+            return wrapper
+        return decorate
+
+    def summary(self):
+        return {'page':self.page,'total_ms':round((time.perf_counter() - self._start) * 1000,3),
+                'stages':[stage.record() for stage in self.stages]}
+
+    # One structured log line for the rerun plus the collapsed diagnostics panel
+    def report(self,st):
+        if not self.enabled:
+            return
+        if self._tracing:
+            self._tracing()
+        summary = self.summary()
+        log.info(json.dumps(summary))
+        with st.expander('Diagnostics'):
+            st.write('Rerun took %.0f ms' % summary['total_ms'])
+            st.dataframe(pd.DataFrame(summary['stages']))
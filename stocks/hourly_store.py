@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from datetime import datetime
+import pandas as pd
+
+from stock_sources import sheet_range
+
+# Local append-only copy of the hourly price worksheets ('past data' and
+# 'Record'), so that a refresh only downloads the rows added since the last one.
+#
+# For each worksheet the store remembers how many data rows it has read and the
+# last of them. A refresh asks for the header plus everything from that last row
+# on, for all worksheets in one batch request; when the first row returned is
+# still the remembered one, only the rows after it are new. Otherwise the
+# worksheet was rewritten (e.g. 'Record' rolled over into 'past data') and it is
+# read again in full. Either way only rows at or after the Date/Time watermark,
+# the latest time already stored, are inserted, and (Date, Time, Symbol) is the
+# primary key so a row moved between worksheets is not stored twice.
+
+STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),'cache','hourly_records.sqlite')
+HOURLY_SHEETS = ['past data','Record']
+KEY_COLUMNS = ['Date','Time','Symbol']
+
+# Widest column read, comfortably past the columns of the hourly worksheets
+LAST_COLUMN = 'ZZ'
+
+def _quote(name):
+    return '"%s"' % name.replace('"','""')
+
+# Date and Time cells as a datetime, so that '9:00' comes before '10:00' and stray
+# whitespace does not matter; None when they are not a valid date and time
+def _stamp(date,time_):
+    try:
+        return datetime.strptime(date.strip() + ' ' + time_.strip(),'%Y-%m-%d %H:%M')
+    except ValueError:
+        return None
+
+class HourlyStore:
+    # path is STORE_PATH unless given
+    def __init__(self,loader,url,path=None,sheets=HOURLY_SHEETS,min_interval=600,clock=time.monotonic):
+        path = path or STORE_PATH
+        self.loader = loader
+        self.url = url
+        self.sheets = sheets
+        self.min_interval = min_interval
+        self.clock = clock
+        os.makedirs(os.path.dirname(path),exist_ok=True)
+        self._conn = sqlite3.connect(path,check_same_thread=False)
+        self._conn.execute('CREATE TABLE IF NOT EXISTS sync_state (sheet TEXT PRIMARY KEY, rows INTEGER, last_row TEXT)')
+        self._lock = threading.RLock()
+        self._frame = None
+        self._last_rowid = 0
+        self._last_sync = None
+
+    def columns(self):
+        return [row[1] for row in self._conn.execute('PRAGMA table_info(records)')]
+
+    # Creates the records table from the first header seen and adds any column a
+    # later header introduces
+    def _ensure_columns(self,header):
+        missing = [name for name in KEY_COLUMNS if name not in header]
+        if missing:
+            raise ValueError('hourly worksheet has no %s column' % ', '.join(missing))
+        columns = self.columns()
+        if not columns:
+            self._conn.execute('CREATE TABLE records (%s, PRIMARY KEY (%s))' % (
+                ', '.join(_quote(name) + ' TEXT' for name in header),', '.join(_quote(name) for name in KEY_COLUMNS)))
+            return
+        for name in header:
+            if name not in columns:
+                self._conn.execute('ALTER TABLE records ADD COLUMN %s TEXT' % _quote(name))
+
+    # Latest Date/Time stored as a datetime, None while the store is empty. Parsed
+    # in Python rather than sorted in SQL, where the cells only compare as strings.
+    def watermark(self):
+        if not self.columns():
+            return None
+        stamps = (_stamp(date,time_) for date,time_ in self._conn.execute('SELECT DISTINCT Date, Time FROM records'))
+        return max((stamp for stamp in stamps if stamp is not None),default=None)
+
+    def _sync_state(self):
+        state = {sheet:(0,None) for sheet in self.sheets}
+        for sheet,rows,last_row in self._conn.execute('SELECT sheet, rows, last_row FROM sync_state'):
+            if sheet in state:
+                state[sheet] = (rows,json.loads(last_row) if last_row else None)
+        return state
+
+    # A1 range from data row `first` (1-based, the header is sheet row 1) to the end
+    def _rows_range(self,sheet,first):
+        return '%s!A%d:%s' % (sheet_range(sheet),first + 1,LAST_COLUMN)
+
+    # Downloads and stores the rows added since the last sync. Returns the number
+    # of rows inserted.
+    def sync(self):
+        with self._lock:
+            state = self._sync_state()
+            ranges = []
+            for sheet in self.sheets:
+                rows, last_row = state[sheet]
+                ranges += [sheet_range(sheet) + '!1:1',self._rows_range(sheet,max(rows,1))]
+            values = self.loader.fetch_ranges(self.url,ranges)
+            headers = {sheet:(values[2 * i] or [[]])[0] for i,sheet in enumerate(self.sheets)}
+            tails = {sheet:values[2 * i + 1] for i,sheet in enumerate(self.sheets)}
+
+            new_rows = {}
+            rewritten = []
+            for sheet in self.sheets:
+                rows, last_row = state[sheet]
+                tail = tails[sheet]
+                if rows == 0:
+                    new_rows[sheet] = tail
+                elif tail and tail[0] == last_row:
+                    new_rows[sheet] = tail[1:]
+                else:
+                    rewritten.append(sheet)
+            if rewritten:
+                full = self.loader.fetch_ranges(self.url,[self._rows_range(sheet,1) for sheet in rewritten])
+                new_rows.update(zip(rewritten,full))
+
+            watermark = self.watermark()
+            inserted = 0
+            for sheet in self.sheets:
+                header = headers[sheet]
+                rows = new_rows[sheet]
+                if header:
+                    inserted += self._insert(header,rows,watermark)
+                rows_seen = len(rows) + (state[sheet][0] if sheet not in rewritten and state[sheet][0] else 0)
+                last_row = rows[-1] if rows else state[sheet][1]
+                self._conn.execute('INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)',(sheet,rows_seen,json.dumps(last_row) if last_row else None))
+            self._conn.commit()
+            self._last_sync = self.clock()
+            return inserted
+
+    def _insert(self,header,rows,watermark):
+        self._ensure_columns(header)
+        width = len(header)
+        date, time_ = header.index('Date'), header.index('Time')
+        rows = [row + [''] * (width - len(row)) if len(row) < width else row[:width] for row in rows]
+        if watermark is not None:
+            # rows whose time cannot be parsed are left to the primary key
+            old = set()
+            for key in {(row[date],row[time_]) for row in rows}:
+                stamp = _stamp(*key)
+                if stamp is not None and stamp < watermark:
+                    old.add(key)
+            rows = [row for row in rows if (row[date],row[time_]) not in old]
+        before = self._conn.total_changes
+        self._conn.executemany('INSERT OR IGNORE INTO records (%s) VALUES (%s)' % (', '.join(_quote(name) for name in header),', '.join('?' * width)),rows)
+        return self._conn.total_changes - before
+
+    # Every stored row, in the order it was first seen ('past data' first, then
+    # 'Record'), with all cells as strings like the worksheets themselves. Rows
+    # already returned once are kept in memory; later calls only read newer rows.
+    def frame(self):
+        with self._lock:
+            if not self.columns():
+                return pd.DataFrame()
+            new = pd.read_sql_query('SELECT rowid AS _rowid, * FROM records WHERE rowid > ? ORDER BY rowid',self._conn,params=(self._last_rowid,))
+            if len(new) or self._frame is None:
+                if len(new):
+                    self._last_rowid = int(new['_rowid'].iloc[-1])
+                new = new.drop(columns='_rowid').fillna('')
+                self._frame = new if self._frame is None else pd.concat([self._frame,new],ignore_index=True).fillna('')
+            return self._frame.copy()
+
+    # Syncs when the last sync is older than min_interval, then returns frame()
+    def refresh(self):
+        with self._lock:
+            if self._last_sync is None or self.clock() - self._last_sync >= self.min_interval:
+                self.sync()
+            return self.frame()
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+
+# Technical indicators for every stock at once, from the daily Close prices.
+#
+# Rows are grouped by stock (in contiguous, time-ordered runs) and each
+# indicator is computed for all stocks in one pass over the whole column:
+# exponential averages with one grouped ewm, rolling windows from cumulative
+# sums. The pass can resume: it returns a per-stock state (counts, the last
+# averages and the last few closes), and handing that state back with only the
+# bars that came after it computes just those bars, exactly as a full
+# recomputation would.
+
+# Which indicators to compute and their windows. Leave a key out to skip it.
+DEFAULT_INDICATORS = {
+    'ema':[12,26],            # ema<span>, exponential moving averages
+    'sma':[20],               # sma<window>, simple moving averages
+    'bollinger':(20,2.0),     # bb_upper / bb_lower: sma(window) +- k population std
+    'rsi':14,                 # rsi<n>, Wilder's relative strength index
+    'macd':(12,26,9),         # macd, macd_signal, macd_hist: (fast, slow, signal) spans
+}
+
+def indicator_columns(config=DEFAULT_INDICATORS):
+    columns = ['ema%d' % span for span in config.get('ema',[])] + ['sma%d' % window for window in config.get('sma',[])]
+    if 'bollinger' in config:
+        columns += ['bb_upper','bb_lower']
+    if 'rsi' in config:
+        columns.append('rsi%d' % config['rsi'])
+    if 'macd' in config:
+        columns += ['macd','macd_signal','macd_hist']
+    return columns
+
+# Spans of every exponential average the config needs, MACD's included
+def _ema_spans(config):
+    spans = list(config.get('ema',[]))
+    if 'macd' in config:
+        spans += [span for span in config['macd'][:2] if span not in spans]
+    return spans
+
+# Longest rolling window, i.e. how many closes a resumed pass must look back on
+def _lookback(config):
+    windows = list(config.get('sma',[])) + ([config['bollinger'][0]] if 'bollinger' in config else [])
+    return max(windows,default=1)
+
+# Start of each run of equal codes, plus the total length at the end
+def _bounds(codes):
+    starts = np.flatnonzero(np.r_[True,codes[1:] != codes[:-1]]) if len(codes) else np.array([],dtype=int)
+    return np.r_[starts,len(codes)]
+
+# Position of each row inside its run
+def _positions(bounds,n):
+    lengths = np.diff(bounds)
+    return np.arange(n) - np.repeat(bounds[:-1],lengths)
+
+# Exponentially weighted average per run (y = (1 - alpha) y' + alpha x), each run
+# continuing from its seed, or starting fresh where the seed is NaN. The runs
+# are laid out as the columns of one (time x run) matrix below a row of seeds,
+# padded with NaN at the end, and averaged in a single ewm.
+def seeded_ewm(values,bounds,alpha,seeds):
+    lengths = np.diff(bounds)
+    matrix = np.full((lengths.max(initial=0) + 1,len(lengths)),np.nan)
+    matrix[0] = seeds
+    rows = _positions(bounds,len(values)) + 1
+    runs = np.repeat(np.arange(len(lengths)),lengths)
+    matrix[rows,runs] = values
+    averaged = pd.DataFrame(matrix).ewm(alpha=alpha,adjust=False).mean().values
+    return averaged[rows,runs]
+
+# Rolling mean and population std of `window` values per run, NaN until a run
+# has `window` values. One rolling pass over all runs back to back; the windows
+# that straddle two runs are the ones masked out.
+def rolling_mean_std(values,bounds,window):
+    rolling = pd.Series(values).rolling(window)
+    valid = _positions(bounds,len(values)) >= window - 1
+    return np.where(valid,rolling.mean().values,np.nan), np.where(valid,rolling.std(ddof=0).values,np.nan)
+
+# Adds the configured indicator columns to `rows`, which must be sorted by key
+# and then by time. Returns (rows with indicators, state). Pass that state back
+# together with only newer bars to extend the indicators without recomputing
+# the history; stocks missing from the state start fresh.
+def compute_indicators(rows,config=DEFAULT_INDICATORS,key='Symbol',state=None):
+    codes, keys = pd.factorize(rows[key])
+    bounds = _bounds(codes)
+    starts = bounds[:-1]
+    close = rows['Close'].values.astype(np.float64)
+    n = len(close)
+    previous = (state if state is not None else pd.DataFrame()).reindex(pd.Index(keys))
+    def seeds(column):
+        return previous[column].values.astype(np.float64) if column in previous.columns else np.full(len(keys),np.nan)
+
+    counts = previous['count'].fillna(0).values.astype(np.int64) if 'count' in previous.columns else np.zeros(len(keys),dtype=np.int64)
+    positions = np.repeat(counts,np.diff(bounds)) + _positions(bounds,n)
+    out = {}
+    new_state = {'count':counts + np.diff(bounds),'last_close':close[bounds[1:] - 1] if n else close[:0]}
+
+    emas = {}
+    for span in _ema_spans(config):
+        emas[span] = seeded_ewm(close,bounds,2 / (span + 1),seeds('ema%d' % span))
+        new_state['ema%d' % span] = emas[span][bounds[1:] - 1]
+    for span in config.get('ema',[]):
+        out['ema%d' % span] = emas[span]
+
+    # Rolling windows: each run is extended at its front with the closes kept in
+    # the state, computed, and the extension dropped again
+    lookback = _lookback(config)
+    tails = previous['tail'] if 'tail' in previous.columns else pd.Series([None] * len(keys))
+    tails = [np.asarray(tail if isinstance(tail,(list,np.ndarray)) else [],dtype=np.float64) for tail in tails]
+    tail_lengths = np.array([len(tail) for tail in tails],dtype=np.int64)
+    extended = np.insert(close,np.repeat(starts,tail_lengths),np.concatenate(tails) if tails else [])
+    extended_bounds = bounds + np.r_[0,np.cumsum(tail_lengths)]
+    is_tail = np.zeros(len(extended),dtype=bool)
+    is_tail[np.repeat(extended_bounds[:-1],tail_lengths) + _positions(np.r_[0,np.cumsum(tail_lengths)],int(tail_lengths.sum()))] = True
+    # a resumed run already has count - len(tail) values before its tail
+    extended_positions = np.repeat(counts - tail_lengths,np.diff(extended_bounds)) + _positions(extended_bounds,len(extended))
+    def rolling(window):
+        mean, std = rolling_mean_std(extended,extended_bounds,window)
+        # windows reaching back past the tail are only valid if the run is that long
+        valid = extended_positions >= window - 1
+        return np.where(valid,mean,np.nan)[~is_tail], np.where(valid,std,np.nan)[~is_tail]
+    for window in config.get('sma',[]):
+        out['sma%d' % window] = rolling(window)[0]
+    if 'bollinger' in config:
+        window, k = config['bollinger']
+        mean, std = rolling(window)
+        out['bb_upper'] = mean + k * std
+        out['bb_lower'] = mean - k * std
+    new_state['tail'] = [extended[max(end - (lookback - 1),begin):end] if lookback > 1 else extended[:0]
+                         for begin,end in zip(extended_bounds[:-1],extended_bounds[1:])]
+
+    if 'rsi' in config:
+        period = config['rsi']
+        before = np.r_[np.nan,close[:-1]]
+        before[starts] = seeds('last_close')
+        delta = close - before
+        gain = seeded_ewm(np.where(np.isnan(delta),np.nan,np.maximum(delta,0)),bounds,1 / period,seeds('rsi_gain'))
+        loss = seeded_ewm(np.where(np.isnan(delta),np.nan,np.maximum(-delta,0)),bounds,1 / period,seeds('rsi_loss'))
+        with np.errstate(divide='ignore',invalid='ignore'):
+            rsi = np.where(loss == 0,100.0,100 - 100 / (1 + gain / loss))
+        out['rsi%d' % period] = np.where(positions >= period,rsi,np.nan)
+        new_state['rsi_gain'] = gain[bounds[1:] - 1]
+        new_state['rsi_loss'] = loss[bounds[1:] - 1]
+
+    if 'macd' in config:
+        fast, slow, signal = config['macd']
+        macd = emas[fast] - emas[slow]
+        macd_signal = seeded_ewm(macd,bounds,2 / (signal + 1),seeds('macd_signal'))
+        out['macd'] = macd
+        out['macd_signal'] = macd_signal
+        out['macd_hist'] = macd - macd_signal
+        new_state['macd_signal'] = macd_signal[bounds[1:] - 1]
+
+    result = rows.assign(**out)
+    new_state = pd.DataFrame(new_state,index=pd.Index(np.asarray(keys,dtype=object),name=key))
+    if state is not None:
+        new_state = pd.concat([state.drop(new_state.index,errors='ignore'),new_state])
+    return result, new_state
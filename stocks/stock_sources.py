@@ -0,0 +1,127 @@
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+# Google Sheets access for the stocks dashboard.
+# Every worksheet the page needs is fetched through one SheetLoader: each
+# spreadsheet is opened once, all of its worksheets come back in a single
+# values_batch_get call, different spreadsheets are fetched concurrently, and the
+# resulting frames are kept for `ttl` seconds in a size-bounded cache.
+
+# Time-to-live cache with least-recently-used eviction once max_entries is reached
+class TTLCache:
+    def __init__(self,ttl=600,max_entries=64,clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self,key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self,key,value):
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl,value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+# A1 range covering a whole worksheet, quoted so names like 'past data' work
+def sheet_range(sheet_name):
+    return "'%s'" % sheet_name.replace("'","''")
+
+# Same frame as pd.DataFrame(ws.get_all_values()[1:], columns=...[0]): the first
+# row is the header and every cell is a string. The values API drops trailing
+# empty cells, so short rows are padded back out with ''.
+def records_frame(records):
+    if not records:
+        return pd.DataFrame()
+    header = records[0]
+    width = len(header)
+    rows = [row + [''] * (width - len(row)) if len(row) < width else row[:width] for row in records[1:]]
+    return pd.DataFrame(rows,columns=header)
+
+class SheetLoader:
+    # client is an authorised gspread Client, or anything with the same
+    # open_by_url / values_batch_get / worksheet(...).get_all_values surface
+    def __init__(self,client,ttl=600,max_entries=64,max_workers=8):
+        self.client = client
+        self.cache = TTLCache(ttl,max_entries)
+        self.max_workers = max_workers
+        self._spreadsheets = {}
+        self._lock = threading.Lock()
+
+    # Spreadsheet handle for a URL, opened on first use only
+    def spreadsheet(self,url):
+        with self._lock:
+            sh = self._spreadsheets.get(url)
+        if sh is None:
+            sh = self.client.open_by_url(url)
+            with self._lock:
+                sh = self._spreadsheets.setdefault(url,sh)
+        return sh
+
+    # Raw cell values of several worksheets of one spreadsheet, one request when
+    # the client supports batch reads and one per worksheet otherwise
+    def _fetch(self,url,sheet_names):
+        sh = self.spreadsheet(url)
+        if hasattr(sh,'values_batch_get'):
+            response = sh.values_batch_get([sheet_range(name) for name in sheet_names])
+            return {name:value_range.get('values',[]) for name,value_range in zip(sheet_names,response['valueRanges'])}
+        return {name:sh.worksheet(name).get_all_values() for name in sheet_names}
+
+    # {url: [sheet names]} -> {url: {sheet name: DataFrame}}. Cached worksheets are
+    # served from memory; the rest are fetched with one batch per spreadsheet and
+    # the spreadsheets in parallel. Callers get their own copy of each frame.
+    def load(self,requests):
+        frames = {url:{} for url in requests}
+        missing = {}
+        for url,sheet_names in requests.items():
+            for name in sheet_names:
+                frame = self.cache.get((url,name))
+                if frame is None:
+                    missing.setdefault(url,[]).append(name)
+                else:
+                    frames[url][name] = frame
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers,len(missing))) as pool:
+                fetched = dict(zip(missing,pool.map(lambda url: self._fetch(url,missing[url]),missing)))
+            for url,values in fetched.items():
+                for name,records in values.items():
+                    frame = records_frame(records)
+                    self.cache.put((url,name),frame)
+                    frames[url][name] = frame
+
+        return {url:{name:frames[url][name].copy() for name in sheet_names} for url,sheet_names in requests.items()}
+
+    # Uncached cell values of A1 ranges (e.g. "'Record'!A120:ZZ") of one
+    # spreadsheet, in one request when the client supports batch reads
+    def fetch_ranges(self,url,ranges):
+        sh = self.spreadsheet(url)
+        if hasattr(sh,'values_batch_get'):
+            response = sh.values_batch_get(ranges)
+            return [value_range.get('values',[]) for value_range in response['valueRanges']]
+        return [sh.worksheet(sheet[1:-1].replace("''","'")).get(cells) for sheet,cells in (a1.rsplit('!',1) for a1 in ranges)]
+
+    def worksheet(self,url,sheet_name):
+        return self.load({url:[sheet_name]})[url][sheet_name]
@@ -0,0 +1,170 @@
+import threading
+import numpy as np
+import pandas as pd
+
+# Typed frames for the stocks dashboard.
+# The worksheets come back as strings. parse_records converts a frame in one pass
+# over a column -> type schema: numbers with pd.to_numeric, labels as categoricals,
+# and Date/Time into one datetime64 column. Dates, times and labels repeat on
+# every row, so each distinct string is parsed once and the result is spread
+# back over the rows by its factorized code.
+
+# Column -> type of the hourly price records ('past data'/'Record' merged with
+# 'Stock Codes'). 'string' columns stay text, with stray whitespace removed.
+HOURLY_SCHEMA = {
+    'Symbol':'category',
+    'Name':'category',
+    'Date':'string',
+    'Time':'string',
+    'Price':'float64',
+}
+
+# Column -> type of the daily OHLC worksheets. The indicators are computed
+# from Close (see indicators.py), not read from the sheets.
+DAILY_SCHEMA = {
+    'Symbol':'category',
+    'Name':'category',
+    'Date':'string',
+    'Open':'float64',
+    'High':'float64',
+    'Low':'float64',
+    'Close':'float64',
+}
+
+# Applies `parse` to the distinct values only (as a pd.Index) and takes the
+# result back out to the full length
+def per_unique(values,parse):
+    codes, uniques = pd.factorize(np.asarray(values,dtype=object))
+    return parse(pd.Index(uniques,dtype=object)).take(codes)
+
+def clean_strings(values):
+    return np.asarray(per_unique(values,lambda u: u.str.strip()),dtype=object)
+
+def clean_categories(values):
+    return per_unique(values,lambda u: pd.CategoricalIndex(u.str.strip())).values
+
+def parse_dates(values,format='%Y-%m-%d'):
+    return per_unique(values,lambda u: pd.to_datetime(u.str.strip(),format=format,errors='coerce'))
+
+# 'HH:MM' -> time since midnight
+def parse_times(values,format='%H:%M'):
+    return per_unique(values,lambda u: pd.to_datetime(u.str.strip(),format=format,errors='coerce') - pd.Timestamp('1900-01-01'))
+
+def parse_column(values,kind):
+    if kind == 'category':
+        return clean_categories(values)
+    if kind == 'string':
+        return clean_strings(values)
+    try:
+        return np.asarray(values).astype(kind)
+    except ValueError:
+        # blank or malformed cells; the slower path turns them into NaN
+        return pd.to_numeric(values,errors='coerce').astype(kind)
+
+# Typed copy of a frame of worksheet strings. Columns in the schema are
+# converted, others are left as they are; 'datetime' is added from Date (and
+# Time when there is one). Blank or malformed cells become NaN/NaT.
+def parse_records(df,schema):
+    typed = {}
+    for column in df.columns:
+        typed[column] = parse_column(df[column].values,schema[column]) if column in schema else df[column].values
+    frame = pd.DataFrame(typed,index=df.index)
+    if 'Date' in frame.columns:
+        stamps = parse_dates(frame['Date'].values)
+        if 'Time' in frame.columns:
+            stamps = stamps + parse_times(frame['Time'].values)
+        frame['datetime'] = stamps
+    return frame
+
+# Hourly records with date_string, the bare date the callbacks filter on
+def parse_hourly(df):
+    frame = parse_records(df,HOURLY_SCHEMA)
+    frame['date_string'] = frame['Date']
+    return frame
+
+def parse_daily(df):
+    return parse_records(df,DAILY_SCHEMA)
+
+# 1 where a day closed above its open, else 0 (flat days and missing prices
+# count as down), compared as numbers
+def candle_directions(df):
+    return (df['Close'].values > df['Open'].values).astype(np.int8)
+
+SUMMARY_COLUMNS = ['Symbol','Name','datetime_str','Price','status']
+
+# Row of each symbol's highest and lowest Price, taking the last row when the
+# extreme occurs more than once, as (highs, lows) frames indexed by Symbol in
+# order of first appearance. Rows without a price are ignored, so a symbol with
+# none is left out. One grouped pass over the rows in reverse: idxmax and idxmin
+# return the first occurrence, which is the last one going forwards.
+def price_extremes(df):
+    df = df[df['Price'].notna().values]
+    # codes number the symbols in order of first appearance
+    codes, symbols = pd.factorize(df['Symbol'])
+    grouped = pd.Series(df['Price'].values).iloc[::-1].groupby(codes[::-1],sort=False)
+    order = np.arange(len(symbols))
+    columns = ['Name','datetime','Price']
+    # Name as plain strings so frames from different batches can be merged
+    highs = df[columns].iloc[grouped.idxmax().reindex(order).values].astype({'Name':object})
+    lows = df[columns].iloc[grouped.idxmin().reindex(order).values].astype({'Name':object})
+    index = pd.Index(np.asarray(symbols,dtype=object),name='Symbol')
+    return highs.set_axis(index,axis=0), lows.set_axis(index,axis=0)
+
+# All-time high and low rows per symbol, interleaved, in the dashboard's layout
+def summary_table(highs,lows):
+    result = pd.concat([highs.assign(status='All Time High'),lows.assign(status='All Time Low')])
+    result = result.iloc[np.arange(2 * len(highs)).reshape(2,-1).T.ravel()]
+    result = result.reset_index()
+    result['Symbol'] = result['Symbol'].astype(str)
+    result['Name'] = result['Name'].astype(str)
+    result['datetime_str'] = result['datetime'].dt.strftime('%Y-%m-%d %H:%M')
+    return result[SUMMARY_COLUMNS]
+
+def max_min_details(df):
+    return summary_table(*price_extremes(df))
+
+# Keeps the all-time high and low per symbol up to date as rows are appended to
+# the hourly history; extend() only looks at the rows it has not seen yet. The
+# page shares one tracker between sessions, so reads and updates hold a lock.
+class MaxMinTracker:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.rows_seen = 0
+        self.highs = None
+        self.lows = None
+
+    # A later row that equals the current extreme replaces it (last occurrence)
+    @staticmethod
+    def _merge(old,new,better):
+        if old is None:
+            return new
+        order = old.index.append(new.index.difference(old.index,sort=False))
+        old = old.reindex(order)
+        new = new.reindex(order)
+        take = (better(new['Price'].values,old['Price'].values) | old['Price'].isna().values) & new['Price'].notna().values
+        merged = old.copy()
+        merged.loc[take] = new.loc[take]
+        return merged
+
+    def update(self,rows):
+        if len(rows) == 0:
+            return
+        with self._lock:
+            highs, lows = price_extremes(rows)
+            self.highs = self._merge(self.highs,highs,np.greater_equal)
+            self.lows = self._merge(self.lows,lows,np.less_equal)
+            self.rows_seen += len(rows)
+
+    # df is the whole append-only history; a shorter one means it was rebuilt
+    def extend(self,df):
+        with self._lock:
+            if len(df) < self.rows_seen:
+                self._reset()
+            self.update(df.iloc[self.rows_seen:])
+
+    def summary(self):
+        with self._lock:
+            return summary_table(self.highs,self.lows)
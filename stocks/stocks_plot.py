@@ -0,0 +1,240 @@
+import numpy as np
+import pandas as pd
+
+# Callbacks and data layout for the stocks dashboard charts.
+# Each chart's rows are shipped sorted by stock and then by time, with a table
+# giving every stock's [start, end) row range. A callback looks the selected
+# stock up in that table, binary-searches the slider's dates inside its range
+# and hands the plot subarray views of the columns, so an interaction costs
+# O(log n + rows shown) instead of a scan over every stock's history.
+
+# Indicators drawn on the daily charts, computed per stock from Close
+CHART_INDICATORS = {'ema':[12,26],'sma':[20],'bollinger':(20,2.0)}
+
+# Rows of `df` sorted by key and datetime, as {column: array} for `columns`,
+# plus {key value: [start, end)}.
+# Rows without a key are left out; no select option can show them.
+def symbol_index(df,columns,key='Name'):
+    df = df[df[key].notna()]
+    df = df.sort_values([key,'datetime'],kind='stable')
+    codes, uniques = pd.factorize(df[key])
+    starts = np.flatnonzero(np.r_[True,codes[1:] != codes[:-1]]) if len(codes) else np.array([],dtype=int)
+    ends = np.r_[starts[1:],len(codes)]
+    offsets = {str(name):[int(start),int(end)] for name,start,end in zip(uniques,starts,ends)}
+    return {column:df[column].values for column in columns}, offsets
+
+# Each level above the full-resolution rows keeps PYRAMID_FACTOR times fewer
+# buckets of consecutive rows per stock, and the lowest and highest point of
+# each, so spikes stay visible however far a chart is zoomed out.
+PYRAMID_FACTOR = 8
+
+# [(data, offsets)] from symbol_index's (data, offsets), finest first: the rows
+# themselves, then min/max of `column` per bucket of 8, 64, ... rows, up to
+# buckets as long as the longest stock's history. A coarser level's data is
+# {'row': the full-resolution rows it keeps}, and its offsets index those.
+def minmax_pyramid(data,offsets,column,factor=PYRAMID_FACTOR):
+    bounds = np.array(list(offsets.values()),dtype=np.int64).reshape(-1,2)
+    lengths = bounds[:,1] - bounds[:,0]
+    values = np.asarray(data[column],dtype=np.float64)
+    run = np.repeat(np.arange(len(bounds)),lengths)
+    position = np.arange(len(values)) - np.repeat(bounds[:,0],lengths)
+    present = np.flatnonzero(~np.isnan(values))
+    longest = int(lengths.max(initial=0))
+    levels = [(data,offsets)]
+    size = factor
+    while size < longest:
+        # bucket numbers increase along the rows, a new range for every stock
+        bucket = run * (longest // size + 1) + position // size
+        grouped = pd.Series(values[present],index=present).groupby(bucket[present],sort=False)
+        picked = np.unique(np.r_[grouped.idxmin().values,grouped.idxmax().values]).astype(np.int32)
+        starts, ends = np.searchsorted(picked,bounds[:,0]), np.searchsorted(picked,bounds[:,1])
+        levels.append(({'row':picked},{name:[int(start),int(end)] for name,start,end in zip(offsets,starts,ends)}))
+        size *= factor
+    return levels
+
+# Rows of the full-resolution level with the stock's points in [start, end)
+# at level k of a min/max pyramid, as level_rows below
+def level_rows(levels,name,level,start,end):
+    raw = levels[0][0]
+    data, offsets = levels[level]
+    first, last = offsets.get(name,[0,0])
+    rows = data['row'][first:last] if 'row' in data else np.arange(first,last)
+    times = raw['datetime'][rows]
+    return rows[np.searchsorted(times,np.datetime64(start),'left'):np.searchsorted(times,np.datetime64(end),'left')]
+
+# The finest level of a min/max pyramid with at most `budget` of the stock's
+# points in [start, end), as pyramid_level below
+def pyramid_level(levels,name,start,end,budget):
+    level = 0
+    while level + 1 < len(levels) and len(level_rows(levels,name,level,start,end)) > budget:
+        level += 1
+    return level
+
+# Python side of pyramid_columns below, for a chart's initial data: the
+# columns of the finest level with at most `budget` of the stock's points in
+# [start, end)
+def pyramid_window(levels,name,start,end,budget):
+    rows = level_rows(levels,name,pyramid_level(levels,name,start,end,budget),start,end)
+    return {column:values[rows] for column,values in levels[0][0].items()}
+
+# What that chart shows, for the source update_line below keeps: the stock,
+# the window its data covers, [start, end) in ms since the epoch, and the
+# pyramid level it comes from
+def pyramid_loaded(levels,name,start,end,budget):
+    ms = lambda t: int(np.datetime64(t,'ms').astype(np.int64))
+    return {'name':[name],'start':[ms(start)],'end':[ms(end)],'level':[pyramid_level(levels,name,start,end,budget)]}
+
+# Helpers shared by the callbacks. Slider values are ms since the epoch; like
+# the dates the page compared before, a window covers whole days, from the
+# start of the first to the end of the last.
+RANGE_JS = """
+        const DAY = 86400000;
+        const t0 = Math.floor(slider.value[0] / DAY) * DAY;
+        const t1 = Math.floor(slider.value[1] / DAY) * DAY + DAY;
+
+        // First index in [lo, hi) whose time is >= x; with `r`, the times
+        // are t[r[lo]] .. t[r[hi - 1]]
+        function bisect(t, lo, hi, x, r) {
+          while (lo < hi) {
+            const mid = (lo + hi) >>> 1;
+            const v = r ? t[r[mid]] : t[mid];
+            if (v < x) lo = mid + 1; else hi = mid;
+          }
+          return lo;
+        }
+
+        // [i, j) rows of a stock inside the slider's days
+        function rows(source, offsets, name) {
+          const range = offsets[name] || [0, 0];
+          const t = source.data['datetime'];
+          const i = bisect(t, range[0], range[1], t0);
+          return [i, bisect(t, i, range[1], t1)];
+        }
+
+        function view(a, i, j) {
+          return a.subarray ? a.subarray(i, j) : a.slice(i, j);
+        }
+
+        // Points a line chart has room for: a low and a high per pixel column
+        function budget(plot) {
+          return 2 * (plot.inner_width || plot.width || plot.plot_width || 600);
+        }
+
+        // [i, j) indexes into level k of a min/max pyramid of the stock's
+        // points in [a, b). levels[0] is the full-resolution source; coarser
+        // levels list rows of it.
+        function level_rows(levels, offsets, name, k, a, b) {
+          const t = levels[0].data['datetime'];
+          const r = k ? levels[k].data['row'] : null;
+          const range = offsets[k][name] || [0, 0];
+          const i = bisect(t, range[0], range[1], a, r);
+          return [i, bisect(t, i, range[1], b, r)];
+        }
+
+        // The finest level with at most `limit` of the stock's points in [a, b)
+        function pyramid_level(levels, offsets, name, limit, a, b) {
+          let k = 0;
+          while (k + 1 < levels.length) {
+            const [i, j] = level_rows(levels, offsets, name, k, a, b);
+            if (j - i <= limit) break;
+            k++;
+          }
+          return k;
+        }
+
+        // The stock's points in [a, b) at level k, as {column: array}
+        function pyramid_columns(levels, offsets, name, k, a, b, names) {
+          const raw = levels[0];
+          const [i, j] = level_rows(levels, offsets, name, k, a, b);
+          if (k == 0) {
+            return columns(raw, names, i, j);
+          }
+          const r = levels[k].data['row'];
+          const data = {};
+          for (const column of names) {
+            const values = raw.data[column];
+            const out = new Float64Array(j - i);
+            for (let m = i; m < j; m++) {
+              out[m - i] = values[r[m]];
+            }
+            data[column] = out;
+          }
+          return data;
+        }
+
+        // The span of a line chart whose points must fit its plot, and the
+        // window to load: the slider's days, or when the plot is zoomed into
+        // part of them, the visible part and that widened by its length on
+        // each side, so a pan has points to show until the next update. A view
+        // taking in all that was loaded, as after the reset tool, goes back to
+        // the slider's days.
+        function line_window(plot, loaded) {
+          const x = plot.x_range;
+          const v0 = Math.max(t0, x.start), v1 = Math.min(t1, x.end);
+          if (!(v1 > v0) || (x.start <= loaded.data['start'][0] && x.end >= loaded.data['end'][0])) {
+            return [t0, t1, t0, t1];
+          }
+          const span = v1 - v0;
+          return [v0, v1, Math.max(t0, v0 - span), Math.min(t1, v1 + span)];
+        }
+
+        // New data for a line chart of the stock from the finest pyramid level
+        // that fits its visible span, recorded in its `loaded` source. Unless
+        // `force`, null while the same stock and level are loaded for all of
+        // the visible span.
+        function update_line(loaded, plot, levels, offsets, name, names, force) {
+          const [v0, v1, a, b] = line_window(plot, loaded);
+          const k = pyramid_level(levels, offsets, name, budget(plot), v0, v1);
+          const current = loaded.data;
+          if (!force && name == current['name'][0] && k == current['level'][0] && v0 >= current['start'][0] && v1 <= current['end'][0]) {
+            return null;
+          }
+          loaded.data = {name: [name], start: [a], end: [b], level: [k]};
+          return pyramid_columns(levels, offsets, name, k, a, b, names);
+        }
+
+        // {column: view} of rows [i, j) for the named columns
+        function columns(source, names, i, j) {
+          const data = {};
+          for (const name of names) {
+            data[name] = view(source.data[name], i, j);
+          }
+          return data;
+        }
+"""
+
+# STI line: a single stock, filed under the name 'all'
+STI_JS = RANGE_JS + """
+        source2.data = update_line(loaded, plot, levels, offsets, 'all', ['datetime', 'Price'], true);
+"""
+
+# Zooming or panning a line chart: its points again for the visible span,
+# when that needs another pyramid level or more of the stock's history
+ZOOM_JS = RANGE_JS + """
+        const data = update_line(loaded, plot, levels, offsets, loaded.data['name'][0], ['datetime', 'Price'], false);
+        if (data) {
+          source.data = data;
+        }
+"""
+
+# One handler for the select and date slider that drives every chart below
+# the STI. Each indexed source is searched once per interaction, and the new
+# data for all the glyph sources is built first and assigned together at the
+# end, so the browser re-renders once rather than once per callback.
+# Hourly prices come from the min/max pyramid level that fits the price chart
+# (see update_line; ZOOM_JS follows its zooming and panning).
+# Everything on the daily charts (candles coloured by their direction column,
+# wicks, EMAs, close, SMA and the Bollinger band) draws from one window source,
+# view_window (named so it does not shadow the browser's window).
+DASHBOARD_JS = RANGE_JS + """
+        const name = select.value;
+        const [i, j] = rows(daily, daily_offsets, name);
+
+        const updates = [
+          [price, update_line(price_loaded, price_plot, hourly, hourly_offsets, name, ['datetime', 'Price'], true)],
+          [view_window, columns(daily, Object.keys(daily.data), i, j)],
+        ];
+        for (const [target, data] of updates) {
+          target.data = data;
+        }
+"""